@@ -2,31 +2,159 @@ from telegram import (
     Update,
     InlineKeyboardButton,
     InlineKeyboardMarkup,
+    InputMediaPhoto,
+    ForceReply,
 )
 from telegram.ext import (
     Application,
+    BaseUpdateProcessor,
     CommandHandler,
     MessageHandler,
     CallbackQueryHandler,
+    ChatMemberHandler,
+    TypeHandler,
     filters,
     ContextTypes,
 )
+from telegram.error import RetryAfter
+from telegram.request import HTTPXRequest
 import os
 import re
+import sys
+import asyncio
 import time
 import json
+import functools
+import hashlib
+import heapq
+import itertools
+import random
 import unicodedata
 import logging
+import logging.handlers
+import multiprocessing
+import queue
+import sqlite3
+import atexit
+import bisect
+import contextlib
+import threading
+import uuid
+from collections import OrderedDict, deque
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from dotenv import load_dotenv
 
 # =========================================================
 # 🔧 LOGGING
 # =========================================================
-logging.basicConfig(
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-    level=logging.INFO,
-)
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+# isi pesan user (field di LOG_BODY_FIELDS) tidak ditulis ke log, kecuali
+# LOG_BODY_MAX_CHARS > 0 -> dipotong sepanjang itu
+LOG_BODY_FIELDS = ("text",)
+LOG_BODY_MAX_CHARS = int(os.getenv("LOG_BODY_MAX_CHARS", "0"))
+# event -> peluang dicatat (1.0 = semua); event lain selalu dicatat
+LOG_SAMPLE_RATES = {
+    "group_message": 0.01,
+    "group_no_menfess": 0.1,
+    "notif_sent": 0.1,
+}
+# event -> maksimum baris per detik
+LOG_RATE_LIMITS = {
+    "group_message": 5,
+    "group_no_menfess": 5,
+    "notif_sent": 5,
+    "badword_hit": 10,
+    "update_shed": 1,
+}
+
+
+class StructuredFormatter(logging.Formatter):
+    """Format teks biasa + field `extra=` sebagai key=value di akhir baris."""
+
+    _RESERVED = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "event"}
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = super().format(record)
+        fields = []
+        for key, value in vars(record).items():
+            if key in self._RESERVED:
+                continue
+            if key in LOG_BODY_FIELDS and isinstance(value, str):
+                value = redact(value)
+            fields.append(f"{key}={value!r}" if isinstance(value, str) else f"{key}={value}")
+        event = getattr(record, "event", None)
+        if event:
+            fields.insert(0, f"event={event}")
+        return f"{line} {' '.join(fields)}" if fields else line
+
+
+def redact(text: str) -> str:
+    if LOG_BODY_MAX_CHARS <= 0:
+        return f"<{len(text)} karakter>"
+    if len(text) > LOG_BODY_MAX_CHARS:
+        return f"{text[:LOG_BODY_MAX_CHARS]}…(+{len(text) - LOG_BODY_MAX_CHARS})"
+    return text
+
+
+class EventSampler(logging.Filter):
+    """Sampling + rate limit per event (`extra={"event": ...}`) sebelum masuk antrian."""
+
+    def __init__(self, sample_rates: dict, rate_limits: dict):
+        super().__init__()
+        self.sample_rates = sample_rates
+        self.rate_limits = rate_limits
+        self._windows: dict[str, list] = {}  # event -> [detik, jumlah]
+        self.dropped: dict[str, int] = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        event = getattr(record, "event", None)
+        if event is None:
+            return True
+
+        rate = self.sample_rates.get(event, 1.0)
+        if rate < 1.0 and random.random() >= rate:
+            self.dropped[event] = self.dropped.get(event, 0) + 1
+            return False
+
+        limit = self.rate_limits.get(event)
+        if limit:
+            second = int(time.monotonic())
+            window = self._windows.get(event)
+            if window is None or window[0] != second:
+                window = self._windows[event] = [second, 0]
+            if window[1] >= limit:
+                self.dropped[event] = self.dropped.get(event, 0) + 1
+                return False
+            window[1] += 1
+        return True
+
+
+def setup_logging() -> logging.handlers.QueueListener:
+    """Log ditulis oleh thread QueueListener; event loop hanya memasukkan ke antrian."""
+    log_queue = queue.SimpleQueue()
+    stream = logging.StreamHandler()
+    stream.setFormatter(StructuredFormatter(LOG_FORMAT))
+
+    queue_handler = logging.handlers.QueueHandler(log_queue)
+    queue_handler.addFilter(LOG_SAMPLER)
+
+    root = logging.getLogger()
+    root.handlers[:] = [queue_handler]
+    root.setLevel(LOG_LEVEL)
+    # httpx mencatat SETIAP request Bot API di level INFO
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    listener = logging.handlers.QueueListener(log_queue, stream, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+    return listener
+
+
+LOG_SAMPLER = EventSampler(LOG_SAMPLE_RATES, LOG_RATE_LIMITS)
+LOG_LISTENER = setup_logging()
 logger = logging.getLogger(__name__)
 
 # =========================================================
@@ -38,13 +166,91 @@ CHANNEL_ID = int(os.getenv("CHANNEL_ID"))
 CHANNEL_USERNAME = os.getenv("CHANNEL_USERNAME")
 GROUP_ID = int(os.getenv("GROUP_ID"))  # <-- pastikan ada di Token.env
 
+# Bot API server lain (mis. telegram-bot-api lokal / stub load test), tanpa "/bot"
+BOT_API_URL = os.getenv("BOT_API_URL")
+
+# mode menerima update: "polling" (default) atau "webhook"
+BOT_MODE = os.getenv("BOT_MODE", "polling").lower()
+WEBHOOK_URL = os.getenv("WEBHOOK_URL")  # URL publik (https) tanpa path
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "telegram")
+WEBHOOK_LISTEN = os.getenv("WEBHOOK_LISTEN", "0.0.0.0")
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", "8443"))
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET")  # dicek di header X-Telegram-Bot-Api-Secret-Token
+# "0" = simpan antrian update selama bot mati (diproses setelah deploy)
+DROP_PENDING_UPDATES = os.getenv("DROP_PENDING_UPDATES", "1") == "1"
+
 ADMINS = [7480707710]  # Ganti dengan ID kamu
 
 VIOLATOR_FILE = "violators.json"
 BADWORDS_FILE = "badwords.txt"
-MENFESS_FILE = "menfess_map.json"  # mapping menfess
-
-COOLDOWN_SECONDS = 600  # 10 menit
+BADWORDS_POLL_SECONDS = 5  # cek perubahan badwords.txt (hot reload)
+
+# filter fuzzy (opt-in): huruf diulang ("anjiiing") & huruf dipisah spasi
+# ("b a b i"), plus toleransi typo kalau BADWORD_FUZZY_DISTANCE > 0. Kata normal
+# bisa kena ("cook" -> cok, "homoo" -> homo, bangsa/bangsat) dan tiap kena
+# dihitung peringatan -> daftar pengecualian di SAFEWORDS_FILE
+BADWORD_FUZZY = os.getenv("BADWORD_FUZZY", "0") == "1"
+BADWORD_FUZZY_DISTANCE = int(os.getenv("BADWORD_FUZZY_DISTANCE", "0"))
+BADWORD_FUZZY_MIN_LEN = 5  # token lebih pendek dari ini tidak dicari dengan typo
+BADWORD_FUZZY_BUDGET_MS = 5.0  # batas waktu pencarian typo per pesan
+SAFEWORDS_FILE = "safewords.txt"  # opsional; kata yang tidak pernah dicocokkan fuzzy
+MENFESS_FILE = "menfess_map.json"  # mapping menfess (snapshot)
+MENFESS_JOURNAL_FILE = "menfess_map.journal"  # event register/link sejak snapshot
+MENFESS_COMPACT_EVERY = 1000  # baris journal sebelum kompaksi ke snapshot
+
+# retensi data
+VIOLATION_HISTORY_MAX = 20  # riwayat pelanggaran yang disimpan per user
+MENFESS_MAX_AGE_DAYS = 90  # entry menfess lebih tua dari ini dihapus dari map
+RETENTION_INTERVAL = 6 * 3600  # detik antar kompaksi background
+
+COOLDOWN_SECONDS = 600  # 10 menit; waktu isi ulang 1 jatah kirim
+COOLDOWN_BURST = 1  # jatah kirim beruntun (mis. 3 per jam: BURST=3, SECONDS=1200)
+COOLDOWN_FILE = "cooldowns.json"
+
+ALBUM_WINDOW_SECONDS = 1.5  # tunggu foto lain dari album yang sama sebelum diproses
+
+# tolak ungkapan yang hampir sama dengan menfess lain dalam jendela waktu
+# (spam banyak akun yang lolos cooldown); kemiripan = 1 - beda bit SimHash / 64
+DUPLICATE_CHECK = os.getenv("DUPLICATE_CHECK", "1") == "1"
+DUPLICATE_SIMILARITY = float(os.getenv("DUPLICATE_SIMILARITY", "0.9"))
+DUPLICATE_WINDOW_SECONDS = 24 * 3600
+DUPLICATE_WINDOW_MAX = 50_000  # fingerprint terbaru yang disimpan
+DUPLICATE_MIN_CHARS = 24  # ungkapan lebih pendek tidak dicek ("kangen kamu")
+
+NOTIF_REPLY_FILE = "notif_reply_map.json"  # notif DM -> komentar grup
+NOTIF_REPLY_MAX = 50_000  # jumlah notif yang masih bisa dibalas
+NOTIF_REPLY_TTL = 7 * 24 * 3600  # detik; notif lebih tua tidak bisa dibalas
+
+# komentar untuk pengirim yang sama dalam jendela ini digabung jadi 1 notif DM;
+# 0 = satu notif per komentar (perilaku lama)
+NOTIF_DIGEST_SECONDS = float(os.getenv("NOTIF_DIGEST_SECONDS", "10"))
+NOTIF_DIGEST_MAX_BUTTONS = 8  # tombol "Balas X" per notif; sisanya cuma dihitung
+
+# batas kirim Bot API (pesan/detik); 429 tetap ditangani lewat RetryAfter
+OUTBOUND_GLOBAL_RATE = 25.0
+OUTBOUND_PRIVATE_RATE = 1.0
+OUTBOUND_GROUP_RATE = 20 / 60
+
+MEMBERSHIP_CACHE_TTL = 600  # detik, status member yang valid
+MEMBERSHIP_NEGATIVE_TTL = 60  # detik, status "belum join" (biar cepat lolos setelah join)
+MEMBERSHIP_CACHE_SIZE = 50_000
+
+# endpoint Prometheus (kosong = mati); /stats di bot selalu tersedia untuk admin
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
+METRICS_LISTEN = os.getenv("METRICS_LISTEN", "127.0.0.1")
+
+# jumlah update yang diproses bersamaan (1 = berurutan seperti dulu);
+# update dari user yang sama tetap diproses satu per satu
+CONCURRENT_UPDATES = int(os.getenv("CONCURRENT_UPDATES", "16"))
+# maksimum update yang menunggu slot; kalau penuh, komentar grup dibuang
+# (callback, perintah admin dan DM tetap menunggu)
+ADMISSION_QUEUE_MAX = int(os.getenv("ADMISSION_QUEUE_MAX", "1000"))
+
+# mode multi-worker: 1 proses depan menerima update lalu membaginya ke N
+# proses worker (per user id / chat id); state bersama di SQLite (WAL)
+WORKERS = int(os.getenv("WORKERS", "1"))  # 1 = satu proses seperti biasa
+SHARED_DB_FILE = os.getenv("SHARED_DB_FILE", "fess_state.db")
+SHARED_COMPACT_EVERY = 5000  # event di log bersama sebelum snapshot ulang
 
 # =========================================================
 # 📌 KONSTANTA FORMAT MENFESS
@@ -70,109 +276,897 @@ MENFESS_SUCCESS_REPLY = (
 CONFIRM_DELETE_TEXT = "Apakah kamu yakin ingin menghapus pesan ini?"
 
 # =========================================================
-# 🔐 SISTEM WARNING & BAN
+# 📊 METRICS
 # =========================================================
-def load_violators():
-    if os.path.exists(VIOLATOR_FILE):
-        with open(VIOLATOR_FILE, "r", encoding="utf-8") as f:
+LATENCY_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+
+
+class Histogram:
+    def __init__(self, buckets: tuple = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # slot terakhir = +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float) -> float:
+        """Perkiraan kuantil (batas atas bucket)."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bound, n in zip(self.buckets, self.counts):
+            seen += n
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+
+class Metrics:
+    """Counter, gauge dan histogram latency dalam proses.
+
+    Bisa diamati dari thread lain (endpoint Prometheus, thread I/O store),
+    jadi semua akses lewat satu lock. Gauge berupa callable yang dibaca
+    saat render, supaya ukuran store tidak perlu di-update manual.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters: dict[tuple, float] = {}
+        self.histograms: dict[tuple, Histogram] = {}
+        self.gauges: dict[str, object] = {}
+
+    @staticmethod
+    def _key(name: str, labels: dict) -> tuple:
+        return (name, tuple(sorted(labels.items())))
+
+    def inc(self, name: str, value: float = 1, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name: str, value: float, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            hist = self.histograms.get(key)
+            if hist is None:
+                hist = self.histograms[key] = Histogram()
+            hist.observe(value)
+
+    def gauge(self, name: str, func):
+        with self._lock:
+            self.gauges[name] = func
+
+    @contextlib.contextmanager
+    def timer(self, name: str, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def counter_value(self, name: str, **labels) -> float:
+        return self.counters.get(self._key(name, labels), 0)
+
+    @staticmethod
+    def _labels(labels: tuple, extra: str = "") -> str:
+        parts = [f'{k}="{v}"' for k, v in labels]
+        if extra:
+            parts.append(extra)
+        return "{" + ",".join(parts) + "}" if parts else ""
+
+    def render_prometheus(self) -> str:
+        lines = []
+        with self._lock:
+            counters = sorted(self.counters.items())
+            histograms = sorted(
+                (key, list(h.counts), h.sum, h.count, h.buckets)
+                for key, h in self.histograms.items()
+            )
+            gauges = sorted(self.gauges.items())
+        for (name, labels), value in counters:
+            lines.append(f"fess_{name}{self._labels(labels)} {value}")
+        for name, func in gauges:
+            lines.append(f"fess_{name} {func()}")
+        for (name, labels), counts, total, count, buckets in histograms:
+            cumulative = 0
+            for bound, n in zip(buckets + (float("inf"),), counts):
+                cumulative += n
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                bucket_labels = self._labels(labels, f'le="{le}"')
+                lines.append(f"fess_{name}_bucket{bucket_labels} {cumulative}")
+            lines.append(f"fess_{name}_sum{self._labels(labels)} {total}")
+            lines.append(f"fess_{name}_count{self._labels(labels)} {count}")
+        return "\n".join(lines) + "\n"
+
+
+METRICS = Metrics()
+
+
+def instrumented(handler):
+    """Catat latency + error tiap handler update."""
+
+    @functools.wraps(handler)
+    async def wrapper(update, context):
+        start = time.perf_counter()
+        try:
+            return await handler(update, context)
+        except Exception:
+            METRICS.inc("handler_errors_total", handler=handler.__name__)
+            raise
+        finally:
+            METRICS.observe(
+                "handler_seconds", time.perf_counter() - start, handler=handler.__name__
+            )
+
+    return wrapper
+
+
+class MetricsRequestHandler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        if self.path.rstrip("/") != "/metrics":
+            self.send_error(404)
+            return
+        payload = METRICS.render_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+
+def start_metrics_server(port: int) -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer((METRICS_LISTEN, port), MetricsRequestHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+    logger.info("Endpoint metrics Prometheus di %s:%s/metrics", METRICS_LISTEN, port)
+    return server
+
+
+# =========================================================
+# 💾 PENYIMPANAN (in-memory + write-behind)
+# =========================================================
+STORE_FLUSH_DELAY = 2.0  # detik; perubahan dalam jendela ini digabung jadi 1 tulis
+STORES: list = []
+SHARED = None  # SharedState di proses worker (mode multi-worker)
+WORKER_INDEX = None  # nomor worker; None = mode satu proses
+STORE_IO_EXECUTOR = ThreadPoolExecutor(max_workers=1, thread_name_prefix="store-io")
+
+
+@contextlib.contextmanager
+def timed_load(path: str):
+    with METRICS.timer("storage_load_seconds", file=path):
+        yield
+
+
+def load_json_file(path: str) -> dict:
+    with timed_load(path):
+        return _load_json_file(path)
+
+
+def _load_json_file(path: str) -> dict:
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
             try:
-                return json.load(f)
+                data = json.load(f)
+                if isinstance(data, dict):
+                    return data
+                return {}
             except json.JSONDecodeError:
                 return {}
     return {}
 
 
-def save_violators(data):
-    with open(VIOLATOR_FILE, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=2, ensure_ascii=False)
+def json_size(obj) -> int:
+    return len(json.dumps(obj, ensure_ascii=False).encode("utf-8"))
 
 
-def add_warning(user_id: int, username: str, badword: str, full_msg: str):
-    data = load_violators()
-    user_id_str = str(user_id)
-    now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-
-    if user_id_str not in data:
-        data[user_id_str] = {
-            "username": username,
-            "warnings": 0,
-            "banned": False,
-            "violations": [],
-        }
+def atomic_write_text(path: str, text: str):
+    """Tulis ke file sementara lalu rename, supaya file tidak pernah setengah jadi."""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(text)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
 
-    user_data = data[user_id_str]
-    user_data["warnings"] += 1
-    user_data["violations"].append(
-        {"word": badword, "message": full_msg, "timestamp": now}
-    )
 
-    if user_data["warnings"] >= 3:
-        user_data["banned"] = True
+class WriteBehindStore:
+    """Basis store: data di memori, ditulis ke disk tertunda dan digabung.
+
+    `mark_dirty()` menjadwalkan satu flush setelah `STORE_FLUSH_DELAY`; semua
+    perubahan dalam jendela itu ikut ke tulis yang sama. Snapshot dibuat di
+    event loop (konsisten), penulisan file di satu thread I/O bersama (FIFO,
+    jadi urutan tulis terjaga). Di luar event loop (skrip, shutdown) flush
+    langsung dan ditunggu sampai selesai.
+
+    Perubahan data lewat `emit(event)` + `apply(event)`: di mode satu proses
+    event langsung diterapkan lalu ditulis ke file; di mode multi-worker event
+    masuk log bersama (`SharedState`) dan diterapkan semua worker dengan
+    urutan yang sama. File JSON tidak disentuh selama mode multi-worker.
+    """
+
+    flush_delay = STORE_FLUSH_DELAY
+    name = ""  # nama store di database bersama
+
+    def __init__(self, path: str):
+        self.path = path
+        self._dirty = False
+        self._flush_handle = None
+        STORES.append(self)
+
+    def serialize(self):
+        raise NotImplementedError
+
+    def dump(self) -> str:
+        """Seluruh isi store sebagai teks JSON (snapshot bersama / ekspor)."""
+        return self.serialize()
+
+    def restore(self, payload: str):
+        raise NotImplementedError
+
+    def apply(self, event: dict):
+        raise NotImplementedError
+
+    def persist(self, event: dict):
+        self.mark_dirty()
+
+    def emit(self, event: dict):
+        if SHARED is not None:
+            SHARED.append(self, event)
+            return
+        self.apply(event)
+        self.persist(event)
+
+    def files(self) -> list:
+        """File yang menyimpan store ini di mode satu proses."""
+        return [self.path]
+
+    def export(self):
+        """Tulis seluruh isi store ke file JSON sekarang juga."""
+        self.write(self.dump())
+
+    def write(self, payload):
+        atomic_write_text(self.path, payload)
+
+    def _timed_write(self, payload):
+        with METRICS.timer("storage_write_seconds", file=self.path):
+            self.write(payload)
+
+    def write_failed(self):
+        self.mark_dirty()
+
+    def mark_dirty(self):
+        if SHARED is not None:
+            return
+        self._dirty = True
+        if self._flush_handle is not None:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self.flush()
+            return
+        self._flush_handle = loop.call_later(
+            self.flush_delay, self._flush_in_background, loop
+        )
+
+    def _take_snapshot(self):
+        self._dirty = False
+        return self.serialize()
+
+    def _flush_in_background(self, loop):
+        self._flush_handle = None
+        if not self._dirty:
+            return
+        future = loop.run_in_executor(
+            STORE_IO_EXECUTOR, self._timed_write, self._take_snapshot()
+        )
+        future.add_done_callback(self._on_write_done)
+
+    def _on_write_done(self, future):
+        if future.exception() is not None:
+            logger.error("Gagal menulis %s: %s", self.path, future.exception())
+            self.write_failed()
+
+    def flush(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        if self._dirty:
+            STORE_IO_EXECUTOR.submit(self._timed_write, self._take_snapshot()).result()
+
+
+def flush_all_stores():
+    for store in STORES:
+        try:
+            store.flush()
+        except Exception as e:
+            logger.error("Gagal flush %s: %s", store.path, e)
+
+
+class SharedState:
+    """Log event bersama semua store di SQLite (WAL), untuk mode multi-worker.
+
+    Setiap perubahan store menjadi satu baris di tabel `events` (id naik
+    terus). Worker menerapkan baris yang belum dilihat secara berurutan lewat
+    `sync()` sebelum memproses update, jadi cooldown, ban dan link menfess
+    sama di semua worker. `PRAGMA data_version` membuat `sync()` tanpa
+    perubahan dari proses lain cukup satu query.
+
+    Event milik worker sendiri langsung diterapkan ke store, lalu INSERT-nya
+    diantrikan ke thread I/O store (FIFO, koneksi SQLite sendiri), jadi event
+    loop tidak pernah menunggu lock tulis SQLite. Baris menyimpan asal
+    (`origin`) dan nomor urut per asal (`seq`); `sync()` melewati baris milik
+    sendiri. Update dibagi per user, jadi event sendiri yang diterapkan lebih
+    dulu dari event worker lain yang hampir bersamaan tidak saling tabrak.
+
+    Setiap `SHARED_COMPACT_EVERY` event, isi semua store diserialisasi di
+    event loop, lalu thread I/O menulis snapshot ke tabel `snapshots` dan
+    menghapus event lama dalam satu transaksi singkat. Snapshot mencakup
+    event sampai `upto` ditambah event milik worker pembuatnya yang mungkin
+    ber-id lebih besar; tabel `coverage` mencatat `seq` terakhir tiap asal
+    yang sudah masuk snapshot. Worker yang tertinggal melewati kompaksi
+    memuat ulang dari snapshot, melewati baris yang sudah tercakup, lalu
+    menerapkan lagi event miliknya yang belum tercakup.
+    """
+
+    def __init__(self, path: str, stores: list):
+        self.path = path
+        self.stores = {store.name: store for store in stores if store.name}
+        self.origin = uuid.uuid4().hex
+        self.conn = self._connect()
+        self.conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS events (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                store TEXT NOT NULL,
+                event TEXT NOT NULL,
+                origin TEXT NOT NULL DEFAULT '',
+                seq INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE TABLE IF NOT EXISTS snapshots (
+                store TEXT PRIMARY KEY,
+                upto INTEGER NOT NULL,
+                payload TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS coverage (
+                origin TEXT PRIMARY KEY,
+                seq INTEGER NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS meta (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL
+            );
+            """
+        )
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(events)")}
+        for column, ddl in (
+            ("origin", "TEXT NOT NULL DEFAULT ''"),
+            ("seq", "INTEGER NOT NULL DEFAULT 0"),
+        ):
+            if column not in columns:  # database dari versi sebelum kolom asal
+                self.conn.execute(f"ALTER TABLE events ADD COLUMN {column} {ddl}")
+        self.last_id = -1  # belum memuat apa pun, termasuk snapshot awal
+        self._data_version = None
+        self._seq = itertools.count(1)
+        self._last_seq = 0
+        # (seq, store, event) milik sendiri yang belum terlihat di log
+        self._unconfirmed: deque = deque()
+        self._covered: dict[str, int] = {}  # origin -> seq dalam snapshot terakhir
+        self._writer = None  # koneksi milik thread I/O store
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(
+            self.path, timeout=30, isolation_level=None, check_same_thread=False
+        )
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _writer_conn(self) -> sqlite3.Connection:
+        if self._writer is None:
+            self._writer = self._connect()
+        return self._writer
+
+    @staticmethod
+    @contextlib.contextmanager
+    def _transaction(conn: sqlite3.Connection, mode: str = ""):
+        conn.execute(f"BEGIN {mode}")
+        try:
+            yield
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def is_empty(self) -> bool:
+        row = self.conn.execute(
+            "SELECT EXISTS(SELECT 1 FROM snapshots) OR EXISTS(SELECT 1 FROM events)"
+        ).fetchone()
+        return not row[0]
+
+    def _dump_stores(self) -> list:
+        return [(name, store.dump()) for name, store in self.stores.items()]
+
+    @staticmethod
+    def _write_snapshots(conn: sqlite3.Connection, upto: int, payloads: list):
+        conn.executemany(
+            "INSERT OR REPLACE INTO snapshots (store, upto, payload) VALUES (?, ?, ?)",
+            [(name, upto, payload) for name, payload in payloads],
+        )
+
+    def json_version(self) -> str:
+        """Penanda isi file JSON store (mtime + ukuran tiap file)."""
+        files = {}
+        for store in self.stores.values():
+            for path in store.files():
+                if os.path.exists(path):
+                    stat = os.stat(path)
+                    files[path] = [stat.st_mtime_ns, stat.st_size]
+        return json.dumps(files, sort_keys=True)
+
+    def _last_event_id(self) -> int:
+        # sqlite_sequence tetap menyimpan id terakhir walau event sudah dikompaksi
+        row = self.conn.execute(
+            "SELECT seq FROM sqlite_sequence WHERE name = 'events'"
+        ).fetchone()
+        return row[0] if row else 0
+
+    def mark_json_synced(self):
+        """Catat bahwa isi database sama dengan file JSON saat ini (seed / export)."""
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+            [
+                ("json_version", self.json_version()),
+                ("json_event_id", str(self._last_event_id())),
+            ],
+        )
+
+    def seed(self) -> bool:
+        """Isi database dari isi store sekarang (file JSON mode satu proses).
+
+        Dilakukan kalau database kosong, atau kalau file JSON berubah sejak
+        database terakhir diisi / diekspor (mode satu proses dipakai di antara
+        dua run multi-worker). Kalau database juga punya event baru sejak saat
+        itu (run multi-worker sebelumnya berhenti tanpa export), kedua sisi
+        tidak bisa digabung: RuntimeError daripada salah satu hilang.
+        """
+        with self._transaction(self.conn, "IMMEDIATE"):
+            if not self.is_empty():
+                meta = dict(self.conn.execute("SELECT key, value FROM meta"))
+                if meta.get("json_version") == self.json_version():
+                    return False
+                if self._last_event_id() > int(meta.get("json_event_id", 0)):
+                    raise RuntimeError(
+                        f"{self.path} dan file JSON sama-sama berubah sejak export "
+                        "terakhir; pilih salah satu (hapus database untuk memakai "
+                        "file JSON, atau kembalikan file JSON dari export terakhir)"
+                    )
+                for table in ("events", "snapshots", "coverage"):
+                    self.conn.execute(f"DELETE FROM {table}")
+            self._write_snapshots(self.conn, 0, self._dump_stores())
+            self.mark_json_synced()
+        return True
+
+    def _restore(self, upto: int):
+        for name, payload in self.conn.execute("SELECT store, payload FROM snapshots"):
+            store = self.stores.get(name)
+            if store is not None:
+                store.restore(payload)
+        self._covered = dict(self.conn.execute("SELECT origin, seq FROM coverage"))
+        covered = self._covered.get(self.origin, 0)
+        while self._unconfirmed and self._unconfirmed[0][0] <= covered:
+            self._unconfirmed.popleft()
+        # event sendiri yang belum masuk snapshot (INSERT masih antri / sesudahnya)
+        for _, name, event in self._unconfirmed:
+            self.stores[name].apply(event)
+        self.last_id = upto
+        logger.info("State bersama dimuat dari snapshot (event %s)", upto)
+
+    def sync(self, force: bool = False) -> int:
+        """Terapkan event baru dari worker lain; kembalikan jumlah event."""
+        if not force:
+            version = self.conn.execute("PRAGMA data_version").fetchone()[0]
+            if version == self._data_version:
+                return 0
+            self._data_version = version
+
+        self.conn.execute("BEGIN")  # baca snapshot + event dari versi yang sama
+        try:
+            upto = self.conn.execute("SELECT MAX(upto) FROM snapshots").fetchone()[0] or 0
+            if upto > self.last_id:
+                self._restore(upto)
+            rows = self.conn.execute(
+                "SELECT id, store, event, origin, seq FROM events WHERE id > ? ORDER BY id",
+                (self.last_id,),
+            ).fetchall()
+        finally:
+            self.conn.execute("COMMIT")
+
+        applied = 0
+        for event_id, name, event, origin, seq in rows:
+            self.last_id = event_id
+            if origin == self.origin:
+                # sudah diterapkan saat append
+                while self._unconfirmed and self._unconfirmed[0][0] <= seq:
+                    self._unconfirmed.popleft()
+                continue
+            if origin in self._covered and seq <= self._covered[origin]:
+                continue  # sudah termasuk snapshot yang dimuat
+            store = self.stores.get(name)
+            if store is not None:
+                store.apply(json.loads(event))
+            applied += 1
+        if applied:
+            METRICS.inc("shared_events_applied_total", applied)
+        return applied
+
+    def append(self, store: WriteBehindStore, event: dict):
+        """Terapkan event sekarang; tulis ke log bersama di thread I/O."""
+        store.apply(event)
+        seq = self._last_seq = next(self._seq)
+        self._unconfirmed.append((seq, store.name, event))
+        row = (store.name, json.dumps(event, ensure_ascii=False), self.origin, seq)
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            loop = None
+        future = STORE_IO_EXECUTOR.submit(self._insert, row, loop)
+        if loop is None and future.result():
+            self.compact()
+
+    def _insert(self, row: tuple, loop) -> bool:
+        """Di thread I/O: INSERT satu event; True kalau saatnya kompaksi."""
+        try:
+            with METRICS.timer("storage_write_seconds", file=self.path):
+                cursor = self._writer_conn().execute(
+                    "INSERT INTO events (store, event, origin, seq) VALUES (?, ?, ?, ?)", row
+                )
+        except sqlite3.Error as e:
+            logger.error("Gagal menulis event %s ke %s: %s", row[0], self.path, e)
+            return False
+        if cursor.lastrowid % SHARED_COMPACT_EVERY:
+            return False
+        if loop is not None:
+            try:
+                loop.call_soon_threadsafe(self.compact)
+            except RuntimeError:
+                pass  # event loop sudah berhenti; kompaksi berikutnya menyusul
+        return True
+
+    def compact(self):
+        """Serialisasi store sekarang, tulis snapshot-nya di thread I/O."""
+        self.sync(force=True)
+        future = STORE_IO_EXECUTOR.submit(
+            self._write_compaction, self.last_id, self._last_seq, self._dump_stores()
+        )
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            future.result()
+
+    def _write_compaction(self, upto: int, own_seq: int, payloads: list):
+        """Di thread I/O: simpan snapshot (event s/d `upto` + event sendiri
+        s/d `own_seq`) dan hapus event yang sudah tercakup."""
+        conn = self._writer_conn()
+        with METRICS.timer("shared_compact_seconds"), self._transaction(conn, "IMMEDIATE"):
+            newer = conn.execute(
+                "SELECT EXISTS(SELECT 1 FROM snapshots WHERE upto > ?)", (upto,)
+            ).fetchone()[0]
+            if newer:
+                logger.info("Kompaksi state bersama dilewati (event %s)", upto)
+                return
+            self._write_snapshots(conn, upto, payloads)
+            conn.execute(
+                "INSERT OR REPLACE INTO coverage (origin, seq) SELECT origin, MAX(seq)"
+                " FROM events WHERE id <= ? AND origin != '' GROUP BY origin",
+                (upto,),
+            )
+            conn.execute(
+                "INSERT OR REPLACE INTO coverage (origin, seq) VALUES (?, ?)",
+                (self.origin, own_seq),
+            )
+            conn.execute("DELETE FROM events WHERE id <= ?", (upto,))
+        logger.info("Kompaksi state bersama sampai event %s", upto)
+
+    def close(self):
+        # tunggu INSERT / kompaksi yang masih antri di thread I/O
+        STORE_IO_EXECUTOR.submit(self._close_writer).result()
+        self.conn.close()
+
+    def _close_writer(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+
+def sync_shared_state():
+    if SHARED is not None:
+        SHARED.sync()
 
-    save_violators(data)
-    return user_data["warnings"], user_data["banned"]
+
+# =========================================================
+# 🔐 SISTEM WARNING & BAN
+# =========================================================
+def last_violation_time(info: dict) -> str:
+    violations = info.get("violations") or []
+    return violations[-1].get("timestamp", "") if violations else ""
+
+
+VIOLATOR_SORTS = {
+    "warnings": lambda item: (-item[1].get("warnings", 0), item[0]),
+    "recent": lambda item: (last_violation_time(item[1]), item[0]),
+    "banned": lambda item: (not item[1].get("banned"), -item[1].get("warnings", 0), item[0]),
+}
+VIOLATOR_SORT_REVERSED = {"recent"}
+
+
+class ViolatorStore(WriteBehindStore):
+    """Data pelanggar di memori; `is_banned` tanpa I/O, format file tetap sama.
+
+    Urutan untuk tampilan admin (/violators) di-cache per mode sort dan
+    dibuang setiap ada perubahan, jadi halaman berikutnya tidak mengurutkan
+    ulang seluruh data.
+    """
+
+    name = "violators"
+
+    def __init__(self, path: str):
+        super().__init__(path)
+        self._load(load_json_file(path))
+
+    def _load(self, data: dict):
+        self.data = data
+        self.banned = {uid for uid, info in self.data.items() if info.get("banned")}
+        self._sorted: dict[str, list[str]] = {}
+
+    def restore(self, payload: str):
+        self._load(json.loads(payload))
+
+    def apply(self, event: dict):
+        op = event["op"]
+        if op == "trim":
+            for info in self.data.values():
+                violations = info.get("violations") or []
+                if len(violations) > event["max"]:
+                    del violations[: -event["max"]]
+            self._sorted.clear()
+            return
+
+        user_id_str = event["id"]
+        if op == "unban":
+            user_data = self.data.get(user_id_str)
+            if user_data is None:
+                return
+            user_data["banned"] = False
+            user_data["warnings"] = 0
+            self.banned.discard(user_id_str)
+        elif op == "ban":
+            self._entry(user_id_str, event["username"])["banned"] = True
+            self.banned.add(user_id_str)
+        elif op == "warn":
+            user_data = self._entry(user_id_str, event["username"])
+            user_data["warnings"] += 1
+            user_data["violations"].append(
+                {"word": event["word"], "message": event["message"], "timestamp": event["ts"]}
+            )
+            if len(user_data["violations"]) > VIOLATION_HISTORY_MAX:
+                del user_data["violations"][:-VIOLATION_HISTORY_MAX]
+            if user_data["warnings"] >= 3:
+                user_data["banned"] = True
+                self.banned.add(user_id_str)
+        self._sorted.clear()
+
+    def sorted_ids(self, sort: str) -> list[str]:
+        ids = self._sorted.get(sort)
+        if ids is None:
+            items = sorted(
+                self.data.items(),
+                key=VIOLATOR_SORTS[sort],
+                reverse=sort in VIOLATOR_SORT_REVERSED,
+            )
+            ids = self._sorted[sort] = [uid for uid, _ in items]
+        return ids
+
+    def query(self, sort: str, text: str | None = None) -> list[str]:
+        """ID pelanggar terurut, opsional difilter user id / potongan username."""
+        ids = self.sorted_ids(sort)
+        if not text:
+            return ids
+        text = text.lstrip("@").lower()
+        if text.isdigit() and text in self.data:
+            return [text]
+        return [
+            uid
+            for uid in ids
+            if text in uid or text in str(self.data[uid].get("username", "")).lower()
+        ]
+
+    def _entry(self, user_id_str: str, username: str) -> dict:
+        if user_id_str not in self.data:
+            self.data[user_id_str] = {
+                "username": username,
+                "warnings": 0,
+                "banned": False,
+                "violations": [],
+            }
+        return self.data[user_id_str]
+
+    def ban(self, user_id: int, username: str = "-") -> dict:
+        user_id_str = str(user_id)
+        if user_id_str not in self.banned:
+            METRICS.inc("bans_total")
+        self.emit({"op": "ban", "id": user_id_str, "username": username})
+        return self.data[user_id_str]
+
+    def trim_history(self, max_items: int, dry_run: bool = False) -> tuple[int, int]:
+        """Potong riwayat pelanggaran ke `max_items` terakhir; (jumlah, byte)."""
+        removed = 0
+        reclaimed = 0
+        for info in self.data.values():
+            violations = info.get("violations") or []
+            extra = len(violations) - max_items
+            if extra <= 0:
+                continue
+            removed += extra
+            reclaimed += sum(json_size(v) for v in violations[:extra])
+        if removed and not dry_run:
+            self.emit({"op": "trim", "max": max_items})
+        return removed, reclaimed
+
+    def unban(self, user_id: int):
+        """Cabut ban + reset hitungan peringatan (riwayat tetap disimpan)."""
+        user_id_str = str(user_id)
+        if user_id_str not in self.data:
+            return None
+        self.emit({"op": "unban", "id": user_id_str})
+        return self.data.get(user_id_str)
+
+    def serialize(self) -> str:
+        return json.dumps(self.data, indent=2, ensure_ascii=False)
+
+    def is_banned(self, user_id: int) -> bool:
+        return str(user_id) in self.banned
+
+    def add_warning(self, user_id: int, username: str, badword: str, full_msg: str):
+        user_id_str = str(user_id)
+        was_banned = user_id_str in self.banned
+        self.emit(
+            {
+                "op": "warn",
+                "id": user_id_str,
+                "username": username,
+                "word": badword,
+                "message": full_msg,
+                "ts": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            }
+        )
+
+        user_data = self.data[user_id_str]
+        METRICS.inc("warnings_total")
+        if user_data["banned"] and not was_banned:
+            METRICS.inc("bans_total")
+        return user_data["warnings"], user_data["banned"]
+
+
+VIOLATORS = ViolatorStore(VIOLATOR_FILE)
+
+
+def add_warning(user_id: int, username: str, badword: str, full_msg: str):
+    return VIOLATORS.add_warning(user_id, username, badword, full_msg)
 
 
 def is_banned(user_id: int) -> bool:
-    data = load_violators()
-    user = data.get(str(user_id))
-    return bool(user and user.get("banned"))
+    return VIOLATORS.is_banned(user_id)
 
 
 # =========================================================
 # 🧠 FILTER KATA KOTOR
 # =========================================================
-with open(BADWORDS_FILE, "r", encoding="utf-8") as f:
-    BAD_WORDS = [line.strip().lower() for line in f if line.strip()]
+def load_badwords(path: str = BADWORDS_FILE) -> list:
+    with open(path, "r", encoding="utf-8") as f:
+        return [line.strip().lower() for line in f if line.strip()]
+
+
+BAD_WORDS = load_badwords()
+
+
+LEET_REPLACEMENTS = {
+    "0": "o",
+    "1": "i",
+    "3": "e",
+    "4": "a",
+    "5": "s",
+    "7": "t",
+    "@": "a",
+    "$": "s",
+    "!": "i",
+    "|": "i",
+    "+": "t",
+    "(": "c",
+    ")": "c",
+    "{": "c",
+    "}": "c",
+    "[": "c",
+    "]": "c",
+    "ᴏ": "o",
+    "ʟ": "l",
+    "ᴀ": "a",
+    "ᴋ": "k",
+    "ɴ": "n",
+    "ᴅ": "d",
+    "ʀ": "r",
+    "ʙ": "b",
+    "ʜ": "h",
+    "ɢ": "g",
+    "ɪ": "i",
+    "ꜱ": "s",
+    "ᴛ": "t",
+    "ᴍ": "m",
+    "ɯ": "m",
+    "ʏ": "y",
+    "ɾ": "r",
+    "ᴘ": "p",
+    "ꞯ": "n",
+}
+
+
+class TextNormalizer:
+    """Normalisasi teks untuk filter: NFKD -> lower -> leetspeak -> buang simbol.
+
+    Tabel `str.translate` disiapkan sekali. Untuk karakter ASCII tabel sudah
+    berisi hasil akhir (leetspeak + hapus simbol), jadi teks ASCII selesai
+    dalam satu pass translate tanpa NFKD maupun regex. Teks non-ASCII tetap
+    lewat NFKD dan regex pembersih yang sudah dikompilasi. Teks pendek yang
+    sering berulang (kata kotor, pesan singkat) di-cache dengan LRU terbatas.
+    """
+
+    def __init__(
+        self,
+        replacements: dict,
+        cache_size: int = 4096,
+        cache_max_len: int = 64,
+    ):
+        self._strip_re = re.compile(r"[^a-z0-9\s]")
+        table = {ord(k): v for k, v in replacements.items()}
+        for code in range(128):
+            value = replacements.get(chr(code), chr(code))
+            table[code] = None if self._strip_re.search(value) else value
+        self._table = table
+        self._cache_max_len = cache_max_len
+        self._cached = (
+            functools.lru_cache(maxsize=cache_size)(self._clean)
+            if cache_size
+            else self._clean
+        )
 
+    def _clean(self, text: str) -> str:
+        if text.isascii():
+            return text.lower().translate(self._table)
+        text = unicodedata.normalize("NFKD", text).lower().translate(self._table)
+        return self._strip_re.sub("", text)
 
-def super_clean_text(text: str) -> str:
-    text = unicodedata.normalize("NFKD", text)
-    text = text.lower()
-
-    replacements = {
-        "0": "o",
-        "1": "i",
-        "3": "e",
-        "4": "a",
-        "5": "s",
-        "7": "t",
-        "@": "a",
-        "$": "s",
-        "!": "i",
-        "|": "i",
-        "+": "t",
-        "(": "c",
-        ")": "c",
-        "{": "c",
-        "}": "c",
-        "[": "c",
-        "]": "c",
-        "ᴏ": "o",
-        "ʟ": "l",
-        "ᴀ": "a",
-        "ᴋ": "k",
-        "ɴ": "n",
-        "ᴅ": "d",
-        "ʀ": "r",
-        "ʙ": "b",
-        "ʜ": "h",
-        "ɢ": "g",
-        "ɪ": "i",
-        "ꜱ": "s",
-        "ᴛ": "t",
-        "ᴍ": "m",
-        "ɯ": "m",
-        "ʏ": "y",
-        "ɾ": "r",
-        "ᴘ": "p",
-        "ꞯ": "n",
-    }
-    for key, val in replacements.items():
-        text = text.replace(key, val)
+    def __call__(self, text: str) -> str:
+        if len(text) <= self._cache_max_len:
+            return self._cached(text)
+        return self._clean(text)
+
+
+TEXT_NORMALIZER = TextNormalizer(LEET_REPLACEMENTS)
 
-    text = re.sub(r"[^a-z0-9\s]", "", text)
-    return text
+
+def super_clean_text(text: str) -> str:
+    return TEXT_NORMALIZER(text)
 
 
 def escape_markdown(text: str) -> str:
@@ -182,18 +1176,286 @@ def escape_markdown(text: str) -> str:
     return text
 
 
-def contains_badword(message: str, badwords: list):
-    cleaned = super_clean_text(message)
-    for word in badwords:
-        word_cleaned = super_clean_text(word)
-        if re.search(rf"\b{re.escape(word_cleaned)}\b", cleaned):
-            logger.info("[DEBUG] Kata terdeteksi: %s -> %s", word, message)
+class BadwordMatcher:
+    """Matcher kata kotor yang disiapkan sekali (startup / reload).
+
+    Kata dibersihkan lebih dulu dengan `super_clean_text`. Teks bersih hanya
+    berisi [a-z0-9] dan spasi, jadi `\\b kata \\b` untuk kata satu token sama
+    dengan "token teks == kata" -> cukup lookup dict. Kata yang berisi spasi
+    (atau kosong setelah dibersihkan) tetap pakai regex yang sudah dikompilasi.
+    Hasilnya sama dengan cara lama: kata pertama (urutan daftar) yang cocok.
+    """
+
+    def __init__(self, badwords: list):
+        self.words = list(badwords)
+        self._token_index: dict[str, int] = {}
+        self._patterns: list[tuple[int, re.Pattern]] = []
+
+        for idx, word in enumerate(self.words):
+            cleaned = super_clean_text(word)
+            if cleaned and cleaned.split() == [cleaned]:
+                self._token_index.setdefault(cleaned, idx)
+            else:
+                self._patterns.append(
+                    (idx, re.compile(rf"\b{re.escape(cleaned)}\b"))
+                )
+
+    def __len__(self) -> int:
+        return len(self.words)
+
+    def find_cleaned(self, cleaned: str):
+        """Cari di teks yang SUDAH dibersihkan, kembalikan kata asli / None."""
+        index = self._token_index
+        best = None
+        for token in cleaned.split():
+            idx = index.get(token)
+            if idx is not None and (best is None or idx < best):
+                best = idx
+
+        for idx, pattern in self._patterns:
+            if best is not None and idx > best:
+                break
+            if pattern.search(cleaned):
+                best = idx
+                break
+
+        return None if best is None else self.words[best]
+
+    def find(self, message: str):
+        return self.find_cleaned(super_clean_text(message))
+
+
+_REPEAT_RE = re.compile(r"(.)\1+")
+
+
+def collapse_repeats(token: str) -> str:
+    """'anjiiiing' -> 'anjing' (huruf berurutan yang sama jadi satu)."""
+    return _REPEAT_RE.sub(r"\1", token)
+
+
+def join_single_chars(tokens: list, min_run: int = 3) -> list:
+    """['b', 'a', 'b', 'i', 'lu'] -> ['babi', 'lu'] untuk deret huruf tunggal."""
+    joined = []
+    run = []
+    for token in tokens + [""]:
+        if len(token) == 1:
+            run.append(token)
+            continue
+        if len(run) >= min_run:
+            joined.append("".join(run))
+        else:
+            joined.extend(run)
+        run = []
+        if token:
+            joined.append(token)
+    return joined
+
+
+def deletions(word: str, depth: int) -> set:
+    """Semua string hasil menghapus 0..`depth` huruf dari `word`."""
+    result = {word}
+    frontier = {word}
+    for _ in range(depth):
+        frontier = {w[:i] + w[i + 1 :] for w in frontier for i in range(len(w))}
+        result |= frontier
+    return result
+
+
+def levenshtein_within(a: str, b: str, limit: int) -> bool:
+    if abs(len(a) - len(b)) > limit:
+        return False
+    prev = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        row = [i]
+        for j, cb in enumerate(b, 1):
+            row.append(min(row[j - 1] + 1, prev[j] + 1, prev[j - 1] + (ca != cb)))
+        if min(row) > limit:
+            return False
+        prev = row
+    return prev[-1] <= limit
+
+
+class FuzzyBadwordMatcher(BadwordMatcher):
+    """`BadwordMatcher` + tahan obfuscation: huruf diulang, dipisah, typo.
+
+    Setelah pencocokan persis gagal, token digabung (deret huruf tunggal) dan
+    huruf berulang diciutkan, lalu dicocokkan ke indeks kata yang diciutkan
+    dengan cara yang sama. Kalau `max_distance` > 0, token sepanjang
+    `min_len` atau lebih dicari lewat indeks "hapus-k-huruf" (symmetric
+    delete): dua kata berjarak Levenshtein <= k pasti punya string yang sama
+    setelah masing-masing dihapus paling banyak k huruf. Jadi per token hanya
+    perlu beberapa lookup dict + verifikasi jarak untuk sedikit kandidat,
+    bukan membandingkan ke semua kata (BK-tree di Python murni masih
+    mengunjungi ratusan node per token). Hasil per token di-cache (LRU)
+    karena kata umum sangat sering berulang. Pencarian typo berhenti saat
+    `budget` detik per pesan habis.
+    """
+
+    def __init__(
+        self,
+        badwords: list,
+        max_distance: int = 0,
+        min_len: int = 5,
+        budget: float = 0.005,
+        safe_words: set | None = None,
+        cache_size: int = 50_000,
+    ):
+        super().__init__(badwords)
+        self.max_distance = max_distance
+        self.min_len = min_len
+        self.budget = budget
+        # token persis (sebelum diciutkan) untuk pencocokan huruf diulang / dipisah,
+        # bentuk diciutkan untuk pencarian typo
+        self._safe_tokens = set(safe_words or ())
+        self.safe_words = {collapse_repeats(w) for w in self._safe_tokens}
+        self._collapsed: dict[str, int] = {}
+        self._deletes: dict[str, list[int]] = {}
+
+        for word, idx in self._token_index.items():
+            key = collapse_repeats(word)
+            if key not in self._collapsed or idx < self._collapsed[key]:
+                self._collapsed[key] = idx
+        # bentuk bersih + diciutkan per indeks: kata leet ("k0nt0l") dibandingkan
+        # dalam bentuk yang sama dengan token pesan
+        self._keys = {idx: key for key, idx in self._collapsed.items()}
+        if max_distance:
+            for key, idx in self._collapsed.items():
+                if len(key) < min_len:
+                    continue  # kata pendek hanya dicocokkan persis
+                for variant in deletions(key, max_distance):
+                    self._deletes.setdefault(variant, []).append(idx)
+
+        self._typo_lookup = (
+            functools.lru_cache(maxsize=cache_size)(self._search)
+            if cache_size
+            else self._search
+        )
+
+    def distance_for(self, token: str) -> int:
+        # token panjang boleh lebih banyak typo: 1 per `min_len` huruf
+        return min(self.max_distance, len(token) // self.min_len)
+
+    def _search(self, token: str):
+        """Indeks kata terkecil dengan jarak Levenshtein <= batas, atau None."""
+        limit = self.distance_for(token)
+        candidates = set()
+        for variant in deletions(token, limit):
+            candidates.update(self._deletes.get(variant, ()))
+        best = None
+        for idx in sorted(candidates):
+            if levenshtein_within(token, self._keys[idx], limit):
+                best = idx
+                break
+        return best
+
+    def find_cleaned(self, cleaned: str):
+        word = super().find_cleaned(cleaned)
+        if word is not None:
             return word
-    return None
+
+        tokens = [
+            collapse_repeats(t)
+            for t in join_single_chars(cleaned.split())
+            if t not in self._safe_tokens
+        ]
+        best = None
+        for token in tokens:
+            idx = self._collapsed.get(token)
+            if idx is not None and (best is None or idx < best):
+                best = idx
+        if best is None and self.max_distance:
+            best = self._find_typo(tokens)
+        return None if best is None else self.words[best]
+
+    def _find_typo(self, tokens: list):
+        deadline = time.perf_counter() + self.budget
+        best = None
+        for token in tokens:
+            if len(token) < self.min_len or token in self.safe_words:
+                continue
+            if time.perf_counter() > deadline:
+                METRICS.inc("moderation_budget_exceeded_total")
+                break
+            idx = self._typo_lookup(token)
+            if idx is not None and (best is None or idx < best):
+                best = idx
+        return best
+
+
+def load_safewords(path: str = SAFEWORDS_FILE) -> set:
+    if not os.path.exists(path):
+        return set()
+    return {super_clean_text(word) for word in load_badwords(path)}
+
+
+def make_badword_matcher(words: list) -> BadwordMatcher:
+    if not BADWORD_FUZZY:
+        return BadwordMatcher(words)
+    return FuzzyBadwordMatcher(
+        words,
+        max_distance=BADWORD_FUZZY_DISTANCE,
+        min_len=BADWORD_FUZZY_MIN_LEN,
+        budget=BADWORD_FUZZY_BUDGET_MS / 1000,
+        safe_words=load_safewords(),
+    )
+
+
+BADWORD_MATCHER = make_badword_matcher(BAD_WORDS)
+_badwords_mtime = os.path.getmtime(BADWORDS_FILE)
+_badwords_reload_lock = asyncio.Lock()
+
+
+def _build_matcher(path: str) -> tuple[list, BadwordMatcher, float]:
+    mtime = os.path.getmtime(path)
+    words = load_badwords(path)
+    return words, make_badword_matcher(words), mtime
+
+
+async def reload_badwords() -> tuple[int, float]:
+    """Bangun matcher baru di thread lain lalu tukar referensinya sekaligus.
+
+    Pengecekan yang sedang berjalan tetap memakai matcher lama sampai selesai;
+    `contains_badword` hanya membaca `BADWORD_MATCHER` sekali per panggilan.
+    """
+    global BAD_WORDS, BADWORD_MATCHER, _badwords_mtime
+    async with _badwords_reload_lock:
+        start = time.perf_counter()
+        words, matcher, mtime = await asyncio.to_thread(_build_matcher, BADWORDS_FILE)
+        BAD_WORDS, BADWORD_MATCHER, _badwords_mtime = words, matcher, mtime
+        elapsed = time.perf_counter() - start
+    METRICS.observe("badwords_reload_seconds", elapsed)
+    logger.info("Daftar kata kotor dimuat ulang: %s kata dalam %.1f ms", len(words), elapsed * 1e3)
+    return len(words), elapsed
+
+
+async def watch_badwords():
+    """Cek mtime badwords.txt berkala; reload otomatis kalau berubah."""
+    while True:
+        await asyncio.sleep(BADWORDS_POLL_SECONDS)
+        try:
+            if os.path.getmtime(BADWORDS_FILE) != _badwords_mtime:
+                await reload_badwords()
+        except Exception as e:
+            # file sedang ditulis / dihapus sementara -> coba lagi putaran berikutnya
+            logger.warning("Gagal reload %s: %s", BADWORDS_FILE, e)
+
+
+def contains_badword(message: str, matcher: BadwordMatcher | None = None):
+    if matcher is None:
+        matcher = BADWORD_MATCHER
+    with METRICS.timer("moderation_seconds"):
+        word = matcher.find(message)
+    if word:
+        logger.info(
+            "Kata terdeteksi: %s",
+            word,
+            extra={"event": "badword_hit", "text": message},
+        )
+    return word
 
 
 # =========================================================
-# 🗂️ MENFESS MAP (pakai teks dinormalisasi + group_root_id)
+# 🗂️ MENFESS MAP (channel_message_id ↔ group_root_id)
 # =========================================================
 def normalize_link_text(text: str) -> str:
     """Normalisasi teks untuk mapping channel ↔ grup (hapus *, rapikan spasi)."""
@@ -205,61 +1467,320 @@ def normalize_link_text(text: str) -> str:
     return t
 
 
-def load_menfess_map():
-    if os.path.exists(MENFESS_FILE):
-        with open(MENFESS_FILE, "r", encoding="utf-8") as f:
-            try:
-                data = json.load(f)
-                if isinstance(data, dict):
-                    return data
-                return {}
-            except json.JSONDecodeError:
-                return {}
-    return {}
-
-
-def save_menfess_map(data):
-    with open(MENFESS_FILE, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=2, ensure_ascii=False)
+def norm_text_key(norm: str) -> bytes:
+    return hashlib.blake2b(norm.encode("utf-8"), digest_size=16).digest()
+
+
+class MenfessStore(WriteBehindStore):
+    """Menfess map di memori + indeks sekunder, disimpan sebagai snapshot + journal.
+
+    - `_by_group`: group_message_id -> channel_message_id (thread di grup).
+    - `_pending`: hash(teks dinormalisasi) -> channel_message_id yang belum
+      ter-link, urut sesuai urutan masuk. Hanya dipakai sebagai fallback
+      kalau pesan auto-forward tidak membawa `forward_from_message_id`.
+
+    Link utama memakai ID pesan channel dari metadata auto-forward, jadi
+    `norm_text` tidak lagi disimpan: kunci fallback dihitung dari `text`.
+    Entry lama yang masih punya `norm_text` dibersihkan saat dimuat.
+
+    Setiap register/link ditambahkan sebagai satu baris JSON ke journal
+    (fsync sekali per flush). Saat journal melewati `MENFESS_COMPACT_EVERY`
+    baris, seluruh map ditulis ulang ke snapshot dan journal dikosongkan.
+    Snapshot memakai format `menfess_map.json` lama, jadi file lama langsung
+    terbaca sebagai snapshot pertama.
+    """
+
+    name = "menfess"
+
+    def __init__(self, path: str, journal_path: str):
+        super().__init__(path)
+        self.journal_path = journal_path
+        self.listeners: list = []  # fn(op, ch_id, info) setiap reg / del
+        self._pending_lines: list[str] = []
+        self._journal_lines = 0
+        self._force_compact = False
+
+        self._load(load_json_file(path))
+        self._replay_journal()
+
+    def _load(self, data: dict):
+        self.data = data
+        self._by_group: dict[int, str] = {}
+        self._pending: dict[bytes, list[str]] = {}
+        now = int(time.time())
+        for ch_id, info in self.data.items():
+            if "created_at" not in info:
+                # entry lama belum punya umur -> mulai dihitung sejak sekarang
+                info["created_at"] = now
+                self._force_compact = True
+            if info.pop("norm_text", None) is not None:
+                # sama dengan normalize_link_text(text) -> cukup dihitung ulang
+                self._force_compact = True
+            self._index(ch_id, info)
+
+    def restore(self, payload: str):
+        self._load(json.loads(payload))
+
+    def _replay_journal(self):
+        if not os.path.exists(self.journal_path):
+            return
+        with open(self.journal_path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    event = json.loads(line)
+                except json.JSONDecodeError:
+                    # baris terakhir bisa terpotong kalau proses mati saat menulis
+                    logger.warning("Baris journal rusak dilewati: %r", line[:80])
+                    continue
+                self.apply(event)
+                self._journal_lines += 1
+
+    def apply(self, event: dict):
+        op = event["op"]
+        if op == "expire":
+            expired = [
+                ch_id
+                for ch_id, info in self.data.items()
+                if info.get("created_at", event["cutoff"]) < event["cutoff"]
+            ]
+            for ch_id in expired:
+                self._unindex(ch_id, self.data.pop(ch_id))
+            return
 
+        ch_id = str(event["id"])
+        if op == "reg":
+            existing = self.data.get(ch_id) or {}
+            if existing:
+                self._unindex(ch_id, existing)
+            info = {
+                "user_id": event["user_id"],
+                "text": event["text"],
+                "group_message_id": existing.get("group_message_id"),
+                "created_at": event.get("ts", int(time.time())),
+            }
+            if event.get("album_ids"):
+                info["album_ids"] = event["album_ids"]
+            self.data[ch_id] = info
+            self._index(ch_id, info)
+        elif op == "link" and ch_id in self.data:
+            info = self.data[ch_id]
+            self._unindex(ch_id, info)
+            info["group_message_id"] = event["group_message_id"]
+            self._index(ch_id, info)
+            return
+        elif op == "del" and ch_id in self.data:
+            info = self.data.pop(ch_id)
+            self._unindex(ch_id, info)
+        else:
+            return
+        for listener in self.listeners:
+            listener(op, ch_id, info)
 
-def register_menfess(channel_message_id: int, sender_user_id: int, full_text: str):
-    """Simpan data menfess berdasarkan ID pesan di channel + teks normalisasi."""
-    data = load_menfess_map()
-    norm = normalize_link_text(full_text)
+    def persist(self, event: dict):
+        if event["op"] == "expire":
+            # satu snapshot lebih murah daripada ribuan baris "del" di journal
+            self.compact()
+            return
+        self._pending_lines.append(json.dumps(event, ensure_ascii=False) + "\n")
+        self.mark_dirty()
+
+    def dump(self) -> str:
+        return json.dumps(self.data, ensure_ascii=False)
+
+    def serialize(self):
+        if self._force_compact or (
+            self._journal_lines + len(self._pending_lines) >= MENFESS_COMPACT_EVERY
+        ):
+            self._pending_lines = []
+            self._journal_lines = 0
+            self._force_compact = False
+            return "snapshot", self.dump()
+
+        lines = self._pending_lines
+        self._pending_lines = []
+        self._journal_lines += len(lines)
+        return "append", "".join(lines)
+
+    def files(self) -> list:
+        return [self.path, self.journal_path]
+
+    def export(self):
+        self.write(("snapshot", self.dump()))
+
+    def write(self, payload):
+        kind, text = payload
+        if kind == "snapshot":
+            atomic_write_text(self.path, text)
+            atomic_write_text(self.journal_path, "")
+            logger.info("Kompaksi menfess map: snapshot %s byte", len(text))
+            return
+        with open(self.journal_path, "a", encoding="utf-8") as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+
+    def write_failed(self):
+        # isi journal tidak pasti -> tulis ulang semuanya dari memori
+        self._force_compact = True
+        self.mark_dirty()
+
+    def compact(self):
+        self._force_compact = True
+        self.mark_dirty()
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+    def _index(self, ch_id: str, info: dict):
+        group_msg_id = info.get("group_message_id")
+        if group_msg_id:
+            self._by_group.setdefault(group_msg_id, ch_id)
+        else:
+            self._pending.setdefault(self._text_key(info), []).append(ch_id)
 
-    existing = data.get(str(channel_message_id)) or {}
-    group_msg_id = existing.get("group_message_id")
+    @staticmethod
+    def _text_key(info: dict) -> bytes:
+        return norm_text_key(normalize_link_text(info.get("text") or ""))
 
-    data[str(channel_message_id)] = {
-        "user_id": sender_user_id,
-        "text": full_text,
-        "norm_text": norm,
-        "group_message_id": group_msg_id,
-    }
-    save_menfess_map(data)
+    def _unindex(self, ch_id: str, info: dict):
+        group_msg_id = info.get("group_message_id")
+        if group_msg_id:
+            if self._by_group.get(group_msg_id) == ch_id:
+                del self._by_group[group_msg_id]
+        else:
+            key = self._text_key(info)
+            pending = self._pending.get(key)
+            if pending and ch_id in pending:
+                pending.remove(ch_id)
+                if not pending:
+                    del self._pending[key]
+
+    def register(
+        self,
+        channel_message_id: int,
+        sender_user_id: int,
+        full_text: str,
+        album_ids: list[int] | None = None,
+    ):
+        ch_id = str(channel_message_id)
+        event = {
+            "op": "reg",
+            "id": ch_id,
+            "user_id": sender_user_id,
+            "text": full_text,
+            "ts": int(time.time()),
+        }
+        if album_ids:
+            # album disimpan sebagai 1 entry (id pesan pertama) + semua id-nya
+            event["album_ids"] = list(album_ids)
+        self.emit(event)
+        return self.data[ch_id]
+
+    def message_ids(self, channel_message_id: int) -> list[int]:
+        """Semua pesan channel milik satu menfess (album = beberapa pesan)."""
+        info = self.data.get(str(channel_message_id)) or {}
+        return info.get("album_ids") or [channel_message_id]
+
+    def remove(self, channel_message_id: int):
+        ch_id = str(channel_message_id)
+        info = self.data.get(ch_id)
+        if info is None:
+            return None
+        self.emit({"op": "del", "id": ch_id})
+        return info
+
+    def expire(self, max_age: float, now: float, dry_run: bool = False) -> tuple[int, int]:
+        """Hapus entry lebih tua dari `max_age` detik; kembalikan (jumlah, byte)."""
+        cutoff = now - max_age
+        expired = [
+            ch_id for ch_id, info in self.data.items() if info.get("created_at", now) < cutoff
+        ]
+        reclaimed = sum(json_size(self.data[ch_id]) for ch_id in expired)
+        if not dry_run and expired:
+            self.emit({"op": "expire", "cutoff": cutoff})
+        return len(expired), reclaimed
+
+    def link_by_channel_id(self, group_message_id: int, channel_message_id: int):
+        """Hubungkan thread grup ke menfess lewat ID pesan channel; O(1)."""
+        ch_id = str(channel_message_id)
+        info = self.data.get(ch_id)
+        if info is None:
+            return None
+        if info.get("group_message_id") != group_message_id:
+            self.emit({"op": "link", "id": ch_id, "group_message_id": group_message_id})
+        return ch_id
+
+    def link_by_text(self, group_message_id: int, text: str):
+        """Fallback: hubungkan ke menfess pertama yang teksnya sama; O(1)."""
+        key = norm_text_key(normalize_link_text(text))
+        pending = self._pending.get(key)
+        if not pending:
+            return None
+
+        ch_id = pending[0]
+        self.emit({"op": "link", "id": ch_id, "group_message_id": group_message_id})
+        return ch_id
+
+    def user_for_group_root(self, group_root_id: int):
+        ch_id = self._by_group.get(group_root_id)
+        if ch_id is None:
+            return None
+        return self.data[ch_id].get("user_id")
+
+
+MENFESS = MenfessStore(MENFESS_FILE, MENFESS_JOURNAL_FILE)
+
+
+def register_menfess(
+    channel_message_id: int,
+    sender_user_id: int,
+    full_text: str,
+    album_ids: list[int] | None = None,
+):
+    """Simpan data menfess berdasarkan ID pesan di channel."""
+    MENFESS.register(channel_message_id, sender_user_id, full_text, album_ids)
     logger.info(
-        "Register menfess channel_message_id=%s user_id=%s norm_len=%s",
+        "Register menfess channel_message_id=%s user_id=%s album=%s",
         channel_message_id,
         sender_user_id,
-        len(norm),
+        len(album_ids or ()),
     )
 
 
+def link_group_root(group_message_id: int, channel_message_id: int | None, text: str):
+    """Hubungkan pesan auto-forward di grup dengan data menfess.
+
+    Pakai `forward_from_message_id` kalau ada; cocokkan teks hanya kalau
+    metadata itu tidak tersedia.
+    """
+    if channel_message_id is None:
+        METRICS.inc("group_links_total", method="text")
+        link_group_root_by_text(group_message_id, text)
+        return
+
+    found_key = MENFESS.link_by_channel_id(group_message_id, channel_message_id)
+    METRICS.inc("group_links_total", method="id" if found_key else "id_miss")
+    if found_key:
+        logger.info(
+            "Link id->menfess: channel_message_id=%s group_message_id=%s",
+            found_key,
+            group_message_id,
+        )
+    else:
+        # mis. postingan channel yang bukan menfess dari bot
+        logger.info(
+            "Tidak ada entry menfess untuk channel_message_id=%s group_msg_id=%s",
+            channel_message_id,
+            group_message_id,
+        )
+
+
 def link_group_root_by_text(group_message_id: int, text: str):
     """Cocokkan teks dari pesan auto-forward di grup dengan data menfess."""
     norm = normalize_link_text(text)
-    data = load_menfess_map()
-    found_key = None
-
-    for ch_id, info in data.items():
-        if not info.get("group_message_id") and info.get("norm_text") == norm:
-            info["group_message_id"] = group_message_id
-            found_key = ch_id
-            break
+    found_key = MENFESS.link_by_text(group_message_id, norm)
 
     if found_key:
-        save_menfess_map(data)
         logger.info(
             "Link text->menfess: channel_message_id=%s group_message_id=%s norm_len=%s",
             found_key,
@@ -281,6 +1802,154 @@ def build_group_message_url(message_id: int) -> str:
     return f"https://t.me/c/{gid}/{message_id}"
 
 
+# =========================================================
+# 🪞 DETEKSI MENFESS KEMBAR (SimHash)
+# =========================================================
+UNGKAPAN_RE = re.compile(r"Ungkapan\s*:\s*(.+)", re.DOTALL | re.IGNORECASE)
+
+
+def simhash(text: str, shingle: int = 4) -> int:
+    """Fingerprint 64 bit dari n-gram huruf teks yang sudah dibersihkan.
+
+    Memakai `hash()` bawaan (acak per proses) karena fingerprint tidak pernah
+    disimpan: indeks selalu dibangun ulang dari menfess map saat start.
+    """
+    text = collapse_repeats(" ".join(super_clean_text(text).split()))
+    grams = {text[i : i + shingle] for i in range(max(1, len(text) - shingle + 1))}
+    # bit ke-i semua n-gram ada di kolom i -> dihitung dengan slicing string (C)
+    bits = "".join([format(hash(gram) & 0xFFFFFFFFFFFFFFFF, "064b") for gram in grams])
+    half = len(grams) / 2
+    fingerprint = 0
+    for i in range(64):
+        fingerprint = (fingerprint << 1) | (bits[i::64].count("1") > half)
+    return fingerprint
+
+
+class DuplicateIndex:
+    """Fingerprint SimHash menfess terbaru dengan indeks band (pigeonhole).
+
+    Dua fingerprint yang berbeda paling banyak `max_bits` bit pasti sama
+    persis di minimal satu dari `max_bits + 1` band, jadi pencarian cukup
+    lookup dict per band lalu hitung beda bit untuk kandidatnya saja.
+    Jendela geser: entry lebih tua dari `window` detik atau di luar
+    `max_size` terbaru dibuang (urutan masuk = urutan waktu).
+
+    Kiriman yang lolos cek langsung dipesan (`reserve`) sampai pipeline
+    selesai, karena menfess baru masuk map setelah kirim ke channel; tanpa
+    itu kiriman kembar yang datang bersamaan tidak saling melihat.
+    """
+
+    def __init__(self, max_bits: int, window: float, max_size: int, min_chars: int):
+        self.max_bits = max_bits
+        self.window = window
+        self.max_size = max_size
+        self.min_chars = min_chars
+        bands = max_bits + 1
+        edges = [64 * i // bands for i in range(bands + 1)]
+        self._bands = [(lo, (1 << (hi - lo)) - 1) for lo, hi in zip(edges, edges[1:])]
+        self._buckets: list[dict[int, dict[str, int]]] = [{} for _ in self._bands]
+        self._entries: OrderedDict[str, tuple[int, float]] = OrderedDict()
+        self._pending_ids = itertools.count(1)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def fingerprint(self, ungkapan: str):
+        """SimHash ungkapan, atau None kalau terlalu pendek untuk dibandingkan."""
+        if len(super_clean_text(ungkapan).replace(" ", "")) < self.min_chars:
+            return None
+        return simhash(ungkapan)
+
+    def _keys(self, fingerprint: int):
+        return [(fingerprint >> shift) & mask for shift, mask in self._bands]
+
+    def reserve(self, fingerprint: int) -> str:
+        """Tempati fingerprint kiriman yang masih di pipeline; kembalikan key-nya."""
+        key = f"pending-{next(self._pending_ids)}"
+        self.add(key, fingerprint, time.time())
+        return key
+
+    def add(self, key: str, fingerprint: int, created: float):
+        self.remove(key)
+        self._entries[key] = (fingerprint, created)
+        for buckets, band in zip(self._buckets, self._keys(fingerprint)):
+            buckets.setdefault(band, {})[key] = fingerprint
+        self.evict(time.time())
+
+    def remove(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for buckets, band in zip(self._buckets, self._keys(entry[0])):
+            bucket = buckets.get(band)
+            if bucket is not None:
+                bucket.pop(key, None)
+                if not bucket:
+                    del buckets[band]
+
+    def evict(self, now: float):
+        cutoff = now - self.window
+        entries = self._entries
+        while entries:
+            key, (_, created) = next(iter(entries.items()))
+            if len(entries) <= self.max_size and created >= cutoff:
+                break
+            self.remove(key)
+
+    def find(self, fingerprint: int, now: float | None = None):
+        """(key, beda bit) menfess termirip dalam batas, atau None."""
+        self.evict(time.time() if now is None else now)
+        best = None
+        best_distance = self.max_bits + 1
+        for buckets, band in zip(self._buckets, self._keys(fingerprint)):
+            bucket = buckets.get(band)
+            if not bucket:
+                continue
+            for key, other in bucket.items():
+                distance = (other ^ fingerprint).bit_count()
+                if distance < best_distance:
+                    best, best_distance = key, distance
+        return None if best is None else (best, best_distance)
+
+    def on_menfess_event(self, op: str, ch_id: str, info: dict):
+        if op == "del":
+            self.remove(ch_id)
+            return
+        match = UNGKAPAN_RE.search(info.get("text") or "")
+        fingerprint = self.fingerprint(match.group(1)) if match else None
+        if fingerprint is not None:
+            self.add(ch_id, fingerprint, info.get("created_at", time.time()))
+
+    def rebuild(self, store: MenfessStore, now: float | None = None):
+        """Isi ulang dari menfess map (hanya entry di dalam jendela)."""
+        now = time.time() if now is None else now
+        start = time.perf_counter()
+        for buckets in self._buckets:
+            buckets.clear()
+        self._entries.clear()
+        recent = sorted(
+            (info.get("created_at", 0), ch_id)
+            for ch_id, info in store.data.items()
+            if info.get("created_at", 0) >= now - self.window
+        )
+        for _, ch_id in recent[-self.max_size :]:
+            self.on_menfess_event("reg", ch_id, store.data[ch_id])
+        logger.info(
+            "Indeks menfess kembar dibangun: %s fingerprint dalam %.1f ms",
+            len(self),
+            (time.perf_counter() - start) * 1e3,
+        )
+
+
+DUPLICATES = DuplicateIndex(
+    max_bits=max(0, round((1 - DUPLICATE_SIMILARITY) * 64)),
+    window=DUPLICATE_WINDOW_SECONDS,
+    max_size=DUPLICATE_WINDOW_MAX,
+    min_chars=DUPLICATE_MIN_CHARS,
+)
+MENFESS.listeners.append(DUPLICATES.on_menfess_event)
+
+
 # =========================================================
 # 🔘 INLINE KEYBOARD BUILDER
 # =========================================================
@@ -315,13 +1984,632 @@ def build_see_message_keyboard(group_message_id: int) -> InlineKeyboardMarkup:
     return InlineKeyboardMarkup(keyboard)
 
 
+def build_digest_keyboard(
+    commenters: list[tuple[str, int]], last_comment_id: int
+) -> InlineKeyboardMarkup:
+    """Satu tombol "Balas X" per komentator + tombol lihat komentar terakhir."""
+    keyboard = [
+        [InlineKeyboardButton(f"💬 Balas {name}", callback_data=f"rto:{comment_id}")]
+        for name, comment_id in commenters[:NOTIF_DIGEST_MAX_BUTTONS]
+    ]
+    keyboard.append(
+        [InlineKeyboardButton("👁 Lihat balasan", url=build_group_message_url(last_comment_id))]
+    )
+    return InlineKeyboardMarkup(keyboard)
+
+
+# =========================================================
+# 📤 PENGIRIMAN KELUAR (rate limit Telegram)
+# =========================================================
+PRIORITY_CHANNEL = 0  # posting / hapus di channel
+PRIORITY_REPLY = 1  # balasan anonim ke grup
+PRIORITY_NOTIF = 2  # notifikasi komentar ke DM
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+        self.blocked_until = 0.0
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def delay(self, now: float) -> float:
+        """Detik sampai 1 token tersedia (0 = siap)."""
+        self._refill(now)
+        wait = 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+        return max(wait, self.blocked_until - now)
+
+    def take(self, now: float):
+        self._refill(now)
+        self.tokens -= 1
+
+    def block(self, until: float):
+        self.blocked_until = max(self.blocked_until, until)
+
+    def idle(self, now: float) -> bool:
+        return self.delay(now) == 0 and self.tokens >= self.capacity
+
+
+class InstrumentedRequest(HTTPXRequest):
+    """HTTPXRequest yang mencatat latency + status setiap panggilan Bot API."""
+
+    async def do_request(self, url: str, method: str, *args, **kwargs):
+        endpoint = url.rsplit("/", 1)[-1]
+        start = time.perf_counter()
+        try:
+            code, payload = await super().do_request(url, method, *args, **kwargs)
+        except Exception as e:
+            METRICS.inc("bot_api_errors_total", method=endpoint, error=type(e).__name__)
+            raise
+        finally:
+            METRICS.observe("bot_api_seconds", time.perf_counter() - start, method=endpoint)
+        METRICS.inc("bot_api_requests_total", method=endpoint, status=code)
+        return code, payload
+
+
+class OutboundScheduler:
+    """Antrian panggilan Bot API keluar dengan token bucket global & per chat.
+
+    Job diambil berdasarkan prioritas (angka kecil dulu) lalu urutan masuk,
+    tapi job yang chat-nya sedang kena limit dilewati supaya tidak menahan
+    chat lain. `RetryAfter` (429) membuat chat itu dijeda sesuai permintaan
+    Telegram + jitter, lalu job diantrikan lagi sampai `max_retries`.
+    """
+
+    def __init__(
+        self,
+        global_rate: float,
+        private_rate: float,
+        group_rate: float,
+        max_retries: int = 3,
+        jitter: float = 1.0,
+    ):
+        self.global_rate = global_rate
+        self.private_rate = private_rate
+        self.group_rate = group_rate
+        self.max_retries = max_retries
+        self.jitter = jitter
+        self._global = TokenBucket(global_rate, global_rate)
+        self._chats: dict[int, TokenBucket] = {}
+        self._queue: list = []
+        self._seq = itertools.count()
+        self._wakeup: asyncio.Event | None = None
+        self._worker: asyncio.Task | None = None
+        self.sent = 0
+        self.retried = 0
+        self.failed = 0
+        self.max_depth = 0
+
+    def _chat_bucket(self, chat_id: int) -> TokenBucket:
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            # id negatif = grup/channel (~20/menit), positif = chat pribadi (~1/detik)
+            rate = self.group_rate if chat_id < 0 else self.private_rate
+            bucket = self._chats[chat_id] = TokenBucket(rate, 1)
+        return bucket
+
+    def depth(self) -> dict:
+        counts: dict[int, int] = {}
+        for priority, *_ in self._queue:
+            counts[priority] = counts.get(priority, 0) + 1
+        return counts
+
+    def stats(self) -> dict:
+        return {
+            "depth": len(self._queue),
+            "depth_by_priority": self.depth(),
+            "max_depth": self.max_depth,
+            "sent": self.sent,
+            "retried": self.retried,
+            "failed": self.failed,
+        }
+
+    async def submit(self, priority: int, chat_id: int, func, /, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        if self._worker is None or self._worker.done():
+            self._wakeup = asyncio.Event()
+            self._worker = loop.create_task(self._run())
+
+        future = loop.create_future()
+        self._push(priority, [chat_id, func, args, kwargs, future, 0])
+        return await future
+
+    def _push(self, priority: int, job: list, seq: int | None = None):
+        seq = next(self._seq) if seq is None else seq
+        heapq.heappush(self._queue, (priority, seq, job))
+        self.max_depth = max(self.max_depth, len(self._queue))
+        self._wakeup.set()
+
+    def _pop_ready(self, now: float):
+        """Ambil job prioritas tertinggi yang chat-nya siap; None + waktu tunggu."""
+        skipped = []
+        found = None
+        wait = None
+        while self._queue:
+            entry = heapq.heappop(self._queue)
+            chat_delay = self._chat_bucket(entry[2][0]).delay(now)
+            if chat_delay <= 0:
+                found = entry
+                break
+            skipped.append(entry)
+            wait = chat_delay if wait is None else min(wait, chat_delay)
+        for entry in skipped:
+            heapq.heappush(self._queue, entry)
+        return found, wait
+
+    def _prune_buckets(self, now: float):
+        if len(self._chats) > 10_000:
+            for chat_id in [c for c, b in self._chats.items() if b.idle(now)]:
+                del self._chats[chat_id]
+
+    async def _run(self):
+        while True:
+            now = time.monotonic()
+            wait = None
+            global_delay = self._global.delay(now)
+            if not self._queue:
+                wait = None
+            elif global_delay > 0:
+                wait = global_delay
+            else:
+                entry, wait = self._pop_ready(now)
+                if entry is not None:
+                    self._global.take(now)
+                    self._chat_bucket(entry[2][0]).take(now)
+                    asyncio.get_running_loop().create_task(self._execute(*entry))
+                    continue
+
+            self._prune_buckets(now)
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=wait)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _execute(self, priority: int, seq: int, job: list):
+        chat_id, func, args, kwargs, future, attempts = job
+        if future.done():
+            return
+        try:
+            result = await func(*args, **kwargs)
+        except RetryAfter as e:
+            if attempts >= self.max_retries:
+                self.failed += 1
+                future.set_exception(e)
+                return
+            self.retried += 1
+            pause = float(e.retry_after) + random.uniform(0, self.jitter)
+            logger.warning(
+                "Flood limit chat_id=%s, ulangi dalam %.1f detik (percobaan %s)",
+                chat_id,
+                pause,
+                attempts + 1,
+            )
+            self._chat_bucket(chat_id).block(time.monotonic() + pause)
+            job[5] = attempts + 1
+            # seq lama dipakai lagi supaya urutan pesan di chat itu tetap
+            self._push(priority, job, seq)
+        except Exception as e:
+            self.failed += 1
+            if not future.done():
+                future.set_exception(e)
+        else:
+            self.sent += 1
+            if not future.done():
+                future.set_result(result)
+
+    async def stop(self):
+        if self._worker is not None:
+            self._worker.cancel()
+            self._worker = None
+
+
+OUTBOUND = OutboundScheduler(
+    OUTBOUND_GLOBAL_RATE, OUTBOUND_PRIVATE_RATE, OUTBOUND_GROUP_RATE
+)
+
+
+# =========================================================
+# 🔀 PEMROSESAN UPDATE PARALEL
+# =========================================================
+ADMIT_URGENT = 0  # tombol inline + perintah admin (spinner Telegram menunggu)
+ADMIT_DM = 1  # menfess / balasan di DM, auto-forward channel (link thread)
+ADMIT_GROUP = 2  # komentar di grup diskusi; dibuang duluan saat overload
+ADMISSION_CLASSES = {ADMIT_URGENT: "urgent", ADMIT_DM: "dm", ADMIT_GROUP: "group"}
+
+
+class PerUserUpdateProcessor(BaseUpdateProcessor):
+    """Update dari user berbeda diproses paralel, dari user yang sama berurutan.
+
+    Lock per user diambil SEBELUM slot, jadi satu user yang spam tidak
+    memakan semua slot. `asyncio.Lock` adil (FIFO), sehingga urutan update
+    per user sama dengan urutan masuk. Store (violators, menfess map,
+    cooldown, notif) hanya diubah dari event loop tanpa `await` di tengah
+    perubahan, dan thread I/O hanya menerima snapshot yang sudah jadi,
+    jadi aman tanpa lock tambahan. Cek-lalu-kirim yang melewati `await`
+    (cooldown) dijaga oleh lock per user ini.
+
+    `process_update` dari PTB (`@final`) memanggil `do_process_update` di
+    bawah semaphore bawaan, jadi lock dan antrian ada di `do_process_update`.
+    Slot (`slots`) dibagikan lewat antrian prioritas:
+    callback / admin dulu, lalu DM, lalu komentar grup. Update dihitung
+    menunggu sejak masuk, baik yang menunggu lock user maupun slot. Kalau
+    lebih dari `queue_max` update menunggu, komentar grup dibuang (coroutine
+    ditutup tanpa dijalankan): yang baru masuk langsung ditolak, dan komentar
+    grup terbaru yang sedang menunggu diusir untuk memberi tempat update
+    prioritas lebih tinggi. Komentar yang diusir saat masih menunggu lock
+    langsung dilepas begitu mendapat lock.
+    """
+
+    def __init__(self, max_concurrent_updates: int, queue_max: int = ADMISSION_QUEUE_MAX):
+        # semaphore bawaan PTB (`process_update`) dibuat praktis tanpa batas:
+        # update yang menunggu di sana tidak terlihat antrian prioritas dan
+        # tidak bisa dibuang. Batas paralel yang sebenarnya `slots`, dan
+        # jumlah yang menunggu dibatasi `queue_max` di bawah.
+        super().__init__(sys.maxsize)
+        self.slots = max_concurrent_updates
+        self.queue_max = queue_max
+        self._locks: dict[int, list] = {}  # key -> [Lock, jumlah pemakai]
+        self._active = 0
+        # tiket (prioritas, seq, future) update yang belum jalan, per seq
+        self._pending: dict[int, tuple[int, int, asyncio.Future]] = {}
+        # jumlah tiket per prioritas; dibaca gauge dari thread /metrics, jadi
+        # tidak boleh iterasi `_pending` yang sedang diubah event loop
+        self._pending_count = dict.fromkeys(ADMISSION_CLASSES, 0)
+        # tiket yang sudah memegang lock user dan menunggu slot
+        self._waiting: list[tuple[int, int, asyncio.Future]] = []  # heap
+        self._seq = itertools.count()
+        METRICS.gauge("admission_active", lambda: self._active)
+        METRICS.gauge("admission_queue_depth", lambda: len(self._pending))
+        for priority, name in ADMISSION_CLASSES.items():
+            METRICS.gauge(
+                f"admission_queue_depth_{name}",
+                lambda p=priority: self._pending_count[p],
+            )
+
+    @staticmethod
+    def update_key(update: object):
+        if isinstance(update, Update):
+            if update.effective_user:
+                return update.effective_user.id
+            if update.effective_chat:
+                return update.effective_chat.id
+        return None
+
+    @staticmethod
+    def update_priority(update: object) -> int:
+        if not isinstance(update, Update):
+            return ADMIT_DM
+        if update.callback_query is not None:
+            return ADMIT_URGENT
+        msg = update.message
+        if msg is None:
+            return ADMIT_DM
+        if msg.chat.id == GROUP_ID:
+            if msg.sender_chat and msg.sender_chat.id == CHANNEL_ID:
+                return ADMIT_DM  # auto-forward: wajib diproses supaya thread ter-link
+            return ADMIT_GROUP
+        if msg.from_user and msg.from_user.id in ADMINS and (msg.text or "").startswith("/"):
+            return ADMIT_URGENT
+        return ADMIT_DM
+
+    async def do_process_update(self, update: object, coroutine):
+        await self._run(self.update_key(update), self.update_priority(update), coroutine)
+
+    async def run_for(self, key, coroutine, priority: int = ADMIT_DM):
+        """Jalankan pekerjaan di luar update (mis. album yang baru lengkap)
+        dengan lock user `key` dan antrian yang sama dengan update biasa."""
+        await self._run(key, priority, coroutine)
+
+    async def _run(self, key, priority: int, coroutine):
+        kind = ADMISSION_CLASSES[priority]
+        start = time.perf_counter()
+        ticket = self._enqueue(priority)
+        if ticket is None:
+            coroutine.close()
+            self._count_shed(priority)
+            return
+        try:
+            async with self._user_lock(key):
+                if not await self._admit(ticket):
+                    coroutine.close()  # sudah dihitung saat diusir
+                    return
+                METRICS.observe("admission_wait_seconds", time.perf_counter() - start, kind=kind)
+                try:
+                    sync_shared_state()
+                    await coroutine
+                finally:
+                    self._release()
+        finally:
+            self._unpend(ticket[1])
+
+    @contextlib.asynccontextmanager
+    async def _user_lock(self, key):
+        if key is None:
+            yield
+            return
+        entry = self._locks.get(key)
+        if entry is None:
+            entry = self._locks[key] = [asyncio.Lock(), 0]
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                yield
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self._locks[key]
+
+    def _count_shed(self, priority: int):
+        kind = ADMISSION_CLASSES[priority]
+        METRICS.inc("updates_shed_total", kind=kind)
+        logger.warning(
+            "Update dibuang (antrian penuh)",
+            extra={"event": "update_shed", "kind": kind, "depth": len(self._pending)},
+        )
+
+    def _enqueue(self, priority: int):
+        """Catat update sebagai menunggu; None kalau langsung dibuang."""
+        if len(self._pending) >= self.queue_max:
+            if priority >= ADMIT_GROUP:
+                return None
+            # beri tempat dengan mengusir komentar grup; kalau tidak ada, tetap antri
+            self._shed_pending()
+        ticket = (priority, next(self._seq), asyncio.get_running_loop().create_future())
+        self._pending[ticket[1]] = ticket
+        self._pending_count[priority] += 1
+        return ticket
+
+    def _unpend(self, seq: int):
+        ticket = self._pending.pop(seq, None)
+        if ticket is not None:
+            self._pending_count[ticket[0]] -= 1
+
+    async def _admit(self, ticket: tuple) -> bool:
+        """Tunggu slot (lock user sudah dipegang); False kalau update ini dibuang."""
+        _, seq, future = ticket
+        if future.done():
+            return future.result()  # diusir selagi menunggu lock user
+        if self._active < self.slots and not self._waiting:
+            self._unpend(seq)
+            self._active += 1
+            return True
+
+        heapq.heappush(self._waiting, ticket)
+        try:
+            return await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled() and future.result():
+                self._release()  # slot sudah diberikan tapi tidak terpakai
+            elif ticket in self._waiting:
+                self._waiting.remove(ticket)
+                heapq.heapify(self._waiting)
+            raise
+
+    def _shed_pending(self) -> bool:
+        """Usir komentar grup terbaru yang sedang menunggu lock atau slot."""
+        candidates = [entry for entry in self._pending.values() if entry[0] >= ADMIT_GROUP]
+        if not candidates:
+            return False
+        victim = max(candidates, key=lambda entry: entry[1])
+        self._unpend(victim[1])
+        if victim in self._waiting:
+            self._waiting.remove(victim)
+            heapq.heapify(self._waiting)
+        victim[2].set_result(False)
+        self._count_shed(victim[0])
+        return True
+
+    def _release(self):
+        while self._waiting:
+            _, seq, future = heapq.heappop(self._waiting)
+            if not future.done():
+                self._unpend(seq)
+                future.set_result(True)  # slot langsung pindah ke penunggu
+                return
+        self._active -= 1
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
+
+
 # =========================================================
 # ⚙️ SISTEM BOT
 # =========================================================
-user_last_sent: dict[int, float] = {}
-notif_reply_map: dict[int, int] = {}  # DM notif msg_id -> komentar msg_id di grup
+class NotifReplyStore(WriteBehindStore):
+    """(chat DM, msg_id notif) -> msg_id komentar di grup; LRU + TTL, persisten.
+
+    ID pesan DM hanya unik per chat, jadi kunci wajib menyertakan chat id.
+    Disimpan ringkas sebagai list `[chat_id, notif_id, comment_id, created]`.
+    """
+
+    flush_delay = 30.0
+    name = "notif_replies"
+
+    def __init__(self, path: str, max_size: int, ttl: float):
+        super().__init__(path)
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: OrderedDict[tuple[int, int], tuple[int, float]] = OrderedDict()
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with timed_load(self.path), open(self.path, "r", encoding="utf-8") as f:
+                rows = json.load(f)
+        except (json.JSONDecodeError, OSError) as e:
+            logger.warning("Gagal memuat %s: %s", self.path, e)
+            return
+        self._load_rows(rows)
+
+    def _load_rows(self, rows: list):
+        self._entries.clear()
+        cutoff = time.time() - self.ttl
+        for chat_id, notif_id, comment_id, created in rows:
+            if created >= cutoff:
+                self._entries[(chat_id, notif_id)] = (comment_id, created)
+        self._evict()
+
+    def restore(self, payload: str):
+        self._load_rows(json.loads(payload))
+
+    def apply(self, event: dict):
+        key = (event["chat_id"], event["notif_id"])
+        self._entries[key] = (event["comment_id"], event["ts"])
+        self._entries.move_to_end(key)
+        self._evict()
+
+    def serialize(self) -> str:
+        rows = [
+            [chat_id, notif_id, comment_id, int(created)]
+            for (chat_id, notif_id), (comment_id, created) in self._entries.items()
+        ]
+        return json.dumps(rows, separators=(",", ":"))
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _evict(self):
+        cutoff = time.time() - self.ttl
+        entries = self._entries
+        while entries:
+            key, (_, created) = next(iter(entries.items()))
+            if len(entries) <= self.max_size and created >= cutoff:
+                break
+            del entries[key]
+
+    def put(self, chat_id: int, notif_msg_id: int, comment_msg_id: int):
+        self.emit(
+            {
+                "chat_id": chat_id,
+                "notif_id": notif_msg_id,
+                "comment_id": comment_msg_id,
+                "ts": time.time(),
+            }
+        )
+
+    def get(self, chat_id: int, notif_msg_id: int):
+        key = (chat_id, notif_msg_id)
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        comment_msg_id, created = entry
+        if created < time.time() - self.ttl:
+            del self._entries[key]
+            self.mark_dirty()
+            return None
+        self._entries.move_to_end(key)
+        return comment_msg_id
+
+
+class CooldownTracker(WriteBehindStore):
+    """Rate limit menfess per user dengan token bucket yang kedaluwarsa sendiri.
+
+    Tiap user punya `capacity` token; satu menfess memakai satu token dan satu
+    token terisi kembali setiap `refill_seconds`. Bucket yang sudah penuh lagi
+    sama dengan user tanpa riwayat, jadi dibuang oleh sweeper berbasis heap
+    (waktu penuh terkecil di atas). Snapshot disimpan supaya restart tidak
+    mereset cooldown. Default (1 token / COOLDOWN_SECONDS) = perilaku lama.
+    """
+
+    flush_delay = 10.0
+    name = "cooldowns"
+
+    def __init__(self, path: str, capacity: float, refill_seconds: float):
+        super().__init__(path)
+        self.capacity = capacity
+        self.refill_seconds = refill_seconds
+        self._load(load_json_file(path))
+
+    def _load(self, data: dict):
+        self._buckets: dict[int, tuple[float, float]] = {}  # user -> (token, waktu)
+        self._expiry_heap: list[tuple[float, int]] = []
+        for user_id, (tokens, updated_at) in data.items():
+            self._set(int(user_id), tokens, updated_at)
+        self.sweep()
+
+    def restore(self, payload: str):
+        self._load(json.loads(payload))
+
+    def apply(self, event: dict):
+        user_id, now = event["user_id"], event["ts"]
+        self._set(user_id, max(0.0, self._tokens(user_id, now) - 1), now)
+        self.sweep(now)
+
+    def serialize(self) -> str:
+        return json.dumps(
+            {uid: [round(t, 4), round(ts, 3)] for uid, (t, ts) in self._buckets.items()},
+            separators=(",", ":"),
+        )
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+    def _full_at(self, tokens: float, updated_at: float) -> float:
+        return updated_at + (self.capacity - tokens) * self.refill_seconds
 
+    def _set(self, user_id: int, tokens: float, updated_at: float):
+        self._buckets[user_id] = (tokens, updated_at)
+        heapq.heappush(self._expiry_heap, (self._full_at(tokens, updated_at), user_id))
 
+    def _tokens(self, user_id: int, now: float) -> float:
+        bucket = self._buckets.get(user_id)
+        if bucket is None:
+            return self.capacity
+        tokens, updated_at = bucket
+        refilled = tokens + max(0.0, now - updated_at) / self.refill_seconds
+        return min(self.capacity, refilled)
+
+    def retry_after(self, user_id: int, now: float | None = None) -> float:
+        """Detik sampai user boleh kirim lagi (0 = boleh sekarang)."""
+        now = time.time() if now is None else now
+        tokens = self._tokens(user_id, now)
+        if tokens >= 1:
+            return 0.0
+        return (1 - tokens) * self.refill_seconds
+
+    def hit(self, user_id: int, now: float | None = None):
+        self.emit({"user_id": user_id, "ts": time.time() if now is None else now})
+
+    def sweep(self, now: float | None = None):
+        now = time.time() if now is None else now
+        heap = self._expiry_heap
+        while heap and heap[0][0] <= now:
+            full_at, user_id = heapq.heappop(heap)
+            bucket = self._buckets.get(user_id)
+            # entri heap basi (bucket sudah dipakai lagi) cukup diabaikan
+            if bucket is not None and self._full_at(*bucket) <= now:
+                del self._buckets[user_id]
+
+
+COOLDOWN = CooldownTracker(COOLDOWN_FILE, COOLDOWN_BURST, COOLDOWN_SECONDS)
+
+
+def cooldown_remaining(user_id: int) -> float:
+    if user_id in ADMINS:
+        return 0.0
+    return COOLDOWN.retry_after(user_id)
+
+
+def record_cooldown(user_id: int):
+    if user_id not in ADMINS:
+        COOLDOWN.hit(user_id)
+
+
+NOTIF_REPLIES = NotifReplyStore(NOTIF_REPLY_FILE, NOTIF_REPLY_MAX, NOTIF_REPLY_TTL)
+
+
+@instrumented
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     text = (
         "===== ___\n\n"
@@ -346,21 +2634,89 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await update.message.reply_text(text, parse_mode="Markdown")
 
 
+class MembershipCache:
+    """Cache LRU status keanggotaan channel dengan TTL (negatif lebih pendek)."""
+
+    def __init__(self, ttl: float, negative_ttl: float, max_size: int):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_size = max_size
+        self._entries: OrderedDict[int, tuple[bool, float]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, user_id: int):
+        entry = self._entries.get(user_id)
+        if entry is not None:
+            is_member, expires_at = entry
+            if expires_at > time.monotonic():
+                self._entries.move_to_end(user_id)
+                self.hits += 1
+                return is_member
+            del self._entries[user_id]
+        self.misses += 1
+        return None
+
+    def put(self, user_id: int, is_member: bool):
+        ttl = self.ttl if is_member else self.negative_ttl
+        self._entries[user_id] = (is_member, time.monotonic() + ttl)
+        self._entries.move_to_end(user_id)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, user_id: int):
+        if self._entries.pop(user_id, None) is not None:
+            self.invalidations += 1
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+            "hit_ratio": round(self.hits / total, 3) if total else 0.0,
+        }
+
+
+MEMBERSHIP_CACHE = MembershipCache(
+    MEMBERSHIP_CACHE_TTL, MEMBERSHIP_NEGATIVE_TTL, MEMBERSHIP_CACHE_SIZE
+)
+
+
 async def check_membership(update: Update, context: ContextTypes.DEFAULT_TYPE) -> bool:
     user_id = update.effective_user.id
-    try:
-        member = await context.bot.get_chat_member(CHANNEL_USERNAME, user_id)
-        if member.status in ["left", "kicked"]:
+    is_member = MEMBERSHIP_CACHE.get(user_id)
+    if is_member is None:
+        try:
+            member = await context.bot.get_chat_member(CHANNEL_USERNAME, user_id)
+        except Exception:
             await update.message.reply_text(
-                f"⚠️ Kamu harus join channel {CHANNEL_USERNAME} dulu!"
+                "⚠️ Gagal mengecek status keanggotaan channel. Pastikan bot sudah admin di channel."
             )
             return False
-        return True
-    except Exception:
+        is_member = member.status not in ["left", "kicked"]
+        MEMBERSHIP_CACHE.put(user_id, is_member)
+
+    if not is_member:
         await update.message.reply_text(
-            "⚠️ Gagal mengecek status keanggotaan channel. Pastikan bot sudah admin di channel."
+            f"⚠️ Kamu harus join channel {CHANNEL_USERNAME} dulu!"
         )
         return False
+    return True
+
+
+@instrumented
+async def on_channel_member_update(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """User join/keluar channel -> buang status lama dari cache."""
+    change = update.chat_member
+    if change is None or change.chat.id != CHANNEL_ID:
+        return
+    MEMBERSHIP_CACHE.invalidate(change.new_chat_member.user.id)
 
 
 # =========================================================
@@ -376,10 +2732,10 @@ async def handle_reply_to_comment(update: Update, context: ContextTypes.DEFAULT_
     parent = msg.reply_to_message
     parent_id = parent.message_id
 
-    if parent_id not in notif_reply_map:
+    group_comment_msg_id = NOTIF_REPLIES.get(msg.chat_id, parent_id)
+    if group_comment_msg_id is None:
         return
 
-    group_comment_msg_id = notif_reply_map[parent_id]
     text = msg.text.strip()
 
     if is_banned(user_id):
@@ -388,7 +2744,7 @@ async def handle_reply_to_comment(update: Update, context: ContextTypes.DEFAULT_
         )
         return
 
-    detected_word = contains_badword(text, BAD_WORDS)
+    detected_word = contains_badword(text)
     if detected_word:
         warnings, banned = add_warning(user_id, username, detected_word, text)
         safe_word = escape_markdown(detected_word)
@@ -407,7 +2763,10 @@ async def handle_reply_to_comment(update: Update, context: ContextTypes.DEFAULT_
         return
 
     reply_text = f"{text}"
-    await context.bot.send_message(
+    await OUTBOUND.submit(
+        PRIORITY_REPLY,
+        GROUP_ID,
+        context.bot.send_message,
         chat_id=GROUP_ID,
         text=reply_text,
         parse_mode="Markdown",
@@ -420,29 +2779,33 @@ async def handle_reply_to_comment(update: Update, context: ContextTypes.DEFAULT_
 # =========================================================
 # 💬 HANDLER DI GRUP DISKUSI
 # =========================================================
+@instrumented
 async def handle_group(update: Update, context: ContextTypes.DEFAULT_TYPE):
     msg = update.message
     if msg is None:
         return
 
-    logger.info(
-        "Pesan di grup: chat_id=%s from=%s text=%r reply_to=%s",
-        msg.chat.id,
-        msg.from_user.id if msg.from_user else None,
-        msg.text,
-        msg.reply_to_message.message_id if msg.reply_to_message else None,
-    )
+    if logger.isEnabledFor(logging.INFO):
+        logger.info(
+            "Pesan di grup",
+            extra={
+                "event": "group_message",
+                "chat_id": msg.chat.id,
+                "from_id": msg.from_user.id if msg.from_user else None,
+                "reply_to": msg.reply_to_message.message_id if msg.reply_to_message else None,
+                "text": msg.text or "",
+            },
+        )
 
     # 1) Pesan auto-forward dari channel (service message)
     if (
-        msg.from_user
-        and msg.from_user.id == 777000
+        (msg.is_automatic_forward or (msg.from_user and msg.from_user.id == 777000))
         and msg.sender_chat
         and msg.sender_chat.id == CHANNEL_ID
         and msg.reply_to_message is None
     ):
         text = msg.text or msg.caption or ""
-        link_group_root_by_text(msg.message_id, text)
+        link_group_root(msg.message_id, msg.forward_from_message_id, text)
         return
 
     # 2) Komentar user di thread
@@ -459,251 +2822,578 @@ async def handle_group(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     group_root_id = root.message_id
 
-    data = load_menfess_map()
-    target_user_id = None
-    for ch_id, info in data.items():
-        if info.get("group_message_id") == group_root_id:
-            target_user_id = info.get("user_id")
-            break
-
+    target_user_id = MENFESS.user_for_group_root(group_root_id)
     if not target_user_id:
-        logger.info("Tidak ditemukan menfess untuk group_root_id=%s", group_root_id)
+        logger.info(
+            "Tidak ditemukan menfess untuk thread",
+            extra={"event": "group_no_menfess", "group_root_id": group_root_id},
+        )
         return
 
     commenter_name = (
         msg.from_user.first_name or msg.from_user.username or "Seseorang"
     )
+    NOTIF_DIGESTS.add(context.bot, target_user_id, msg.from_user.id, commenter_name, msg.message_id)
+
+
+class NotifDigest:
+    """Gabungkan komentar untuk satu pengirim menfess jadi satu notif DM.
+
+    Komentar pertama membuka jendela `window` detik (tidak diperpanjang, jadi
+    notif paling telat `window` detik). Komentator yang sama hanya dicatat
+    sekali dengan komentar terbarunya. Notif dipetakan ke komentar terakhir
+    di NOTIF_REPLIES; tombol "Balas X" mengarah ke komentar tiap orang.
+    """
+
+    def __init__(self, window: float):
+        self.window = window
+        self._digests: dict[int, dict] = {}
+
+    def __len__(self) -> int:
+        return len(self._digests)
+
+    def add(self, bot, target_user_id: int, commenter_id: int, name: str, comment_id: int):
+        METRICS.inc("notif_comments_total")
+        digest = self._digests.get(target_user_id)
+        if digest is None:
+            digest = {"bot": bot, "commenters": {}, "count": 0, "last_comment_id": comment_id}
+            self._digests[target_user_id] = digest
+            if self.window > 0:
+                digest["task"] = asyncio.create_task(self._flush_later(target_user_id))
+            else:
+                digest["task"] = asyncio.create_task(self.flush(target_user_id))
+
+        commenters = digest["commenters"]
+        commenters.pop(commenter_id, None)  # pindah ke akhir = paling baru
+        commenters[commenter_id] = (name, comment_id)
+        digest["count"] += 1
+        digest["last_comment_id"] = comment_id
+
+    async def _flush_later(self, target_user_id: int):
+        await asyncio.sleep(self.window)
+        await self.flush(target_user_id)
+
+    async def flush(self, target_user_id: int):
+        digest = self._digests.pop(target_user_id, None)
+        if digest is None:
+            return
+        sync_shared_state()
+        commenters = list(reversed(digest["commenters"].values()))  # terbaru dulu
+        last_comment_id = digest["last_comment_id"]
+
+        if digest["count"] == 1:
+            name = commenters[0][0]
+            notif_text = (
+                f"{name}, baru saja mengomentari postinganmu!\n\n"
+                f"Balas pesan ini untuk membalas komentar {name} secara anonim"
+            )
+            keyboard = build_see_message_keyboard(last_comment_id)
+        else:
+            names = ", ".join(name for name, _ in commenters[:NOTIF_DIGEST_MAX_BUTTONS])
+            others = len(commenters) - NOTIF_DIGEST_MAX_BUTTONS
+            if others > 0:
+                names += f" dan {others} orang lainnya"
+            notif_text = (
+                f"💬 {digest['count']} komentar baru di postinganmu dari {names}.\n\n"
+                f"Balas pesan ini untuk membalas komentar terakhir, atau pilih "
+                f"tombol di bawah untuk membalas orang tertentu secara anonim"
+            )
+            keyboard = build_digest_keyboard(
+                [(name, comment_id) for name, comment_id in commenters], last_comment_id
+            )
 
-    notif_text = (
-        f"{commenter_name}, baru saja mengomentari postinganmu!\n\n"
-        f"Balas pesan ini untuk membalas komentar {commenter_name} secara anonim"
-    )
+        try:
+            notif_msg = await OUTBOUND.submit(
+                PRIORITY_NOTIF,
+                target_user_id,
+                digest["bot"].send_message,
+                chat_id=target_user_id,
+                text=notif_text,
+                reply_markup=keyboard,
+            )
+            NOTIF_REPLIES.put(notif_msg.chat_id, notif_msg.message_id, last_comment_id)
+            METRICS.inc("notifications_total", result="sent")
+            logger.info(
+                "Notif terkirim",
+                extra={
+                    "event": "notif_sent",
+                    "target_user_id": target_user_id,
+                    "comment_msg_id": last_comment_id,
+                    "comments": digest["count"],
+                    "commenters": len(commenters),
+                },
+            )
+        except Exception as e:
+            METRICS.inc("notifications_total", result="failed")
+            logger.warning("Gagal kirim notif ke pengirim menfess: %s", e)
 
-    keyboard = build_see_message_keyboard(msg.message_id)
+    async def flush_all(self):
+        """Kirim semua notif yang masih ditahan (dipanggil saat shutdown)."""
+        for target_user_id in list(self._digests):
+            digest = self._digests.get(target_user_id)
+            if digest is not None and digest.get("task") is not None:
+                digest["task"].cancel()
+            await self.flush(target_user_id)
 
-    try:
-        notif_msg = await context.bot.send_message(
-            chat_id=target_user_id,
-            text=notif_text,
-            reply_markup=keyboard,
-        )
-        notif_reply_map[notif_msg.message_id] = msg.message_id
-        logger.info(
-            "Notif terkirim ke %s untuk komentar msg_id=%s",
-            target_user_id,
-            msg.message_id,
-        )
-    except Exception as e:
-        logger.warning("Gagal kirim notif ke pengirim menfess: %s", e)
+
+NOTIF_DIGESTS = NotifDigest(NOTIF_DIGEST_SECONDS)
 
 
 # =========================================================
 # 📨 PROSES MENFESS (TEKS / FOTO)
 # =========================================================
-async def process_menfess_text(
-    user_id: int,
-    username: str,
-    user_text: str,
-    context: ContextTypes.DEFAULT_TYPE,
-    update: Update,
-    photo: str | None = None,
-):
-    now = time.time()
+class MenfessSubmission:
+    """Satu kiriman menfess (teks / foto) yang sedang lewat pipeline."""
+
+    def __init__(
+        self,
+        update: Update,
+        context: ContextTypes.DEFAULT_TYPE,
+        text: str | None,
+        photos: list | None = None,
+    ):
+        self.update = update
+        self.context = context
+        self.user_id = update.effective_user.id
+        self.username = update.effective_user.username or "-"
+        self.text = (text or "").strip()
+        self.photos = photos or []  # file_id foto, urut seperti dikirim
+        self.caption: str | None = None  # teks final untuk channel
+        self.ungkapan: str | None = None
+        self.channel_message_id: int | None = None
+        self.duplicate_key: str | None = None  # fingerprint yang dipesan di DUPLICATES
+        self.timings: dict[str, float] = {}
+
+    async def reply(self, text: str, **kwargs):
+        await self.update.message.reply_text(text, **kwargs)
+
+
+async def stage_not_banned(sub: MenfessSubmission) -> bool:
+    if not is_banned(sub.user_id):
+        return True
+    await sub.reply("🚫 Kamu telah diblokir karena berulang kali melanggar aturan.")
+    return False
 
-    if is_banned(user_id):
-        await update.message.reply_text(
-            "🚫 Kamu telah diblokir karena berulang kali melanggar aturan."
-        )
-        return
 
-    if user_id not in ADMINS and user_id in user_last_sent:
-        elapsed = now - user_last_sent[user_id]
-        if elapsed < COOLDOWN_SECONDS:
-            remaining = int((COOLDOWN_SECONDS - elapsed) / 60) + 1
-            await update.message.reply_text(
-                f"⏳ Tunggu {remaining} menit lagi sebelum kirim menfess berikutnya."
-            )
-            return
+async def stage_cooldown(sub: MenfessSubmission) -> bool:
+    wait = cooldown_remaining(sub.user_id)
+    if wait <= 0:
+        return True
+    remaining = int(wait / 60) + 1
+    await sub.reply(
+        f"⏳ Kamu hanya bisa kirim {COOLDOWN_BURST} menfess setiap "
+        f"{COOLDOWN_BURST * COOLDOWN_SECONDS // 60} menit.\n"
+        f"Tunggu sekitar {remaining} menit lagi ya."
+    )
+    return False
+
+
+async def stage_has_text(sub: MenfessSubmission) -> bool:
+    if sub.text:
+        return True
+    await sub.reply("❌ Kirim foto dengan caption sesuai format menfess.")
+    return False
+
+
+async def stage_badword(sub: MenfessSubmission) -> bool:
+    # sebelum cek format: pesan kasar yang formatnya salah tetap kena peringatan
+    detected_word = contains_badword(sub.text)
+    if not detected_word:
+        return True
+
+    warnings, banned = add_warning(sub.user_id, sub.username, detected_word, sub.text)
+    safe_word = escape_markdown(detected_word)
+    if banned:
+        await sub.reply(
+            f"🚫 Kamu telah diblokir karena 3 kali melanggar aturan.\n"
+            f"Kata terakhir yang melanggar: `{safe_word}`",
+            parse_mode="Markdown",
+        )
+    else:
+        await sub.reply(
+            f"⚠️ Pesanmu mengandung kata yang tidak pantas: `{safe_word}`\n"
+            f"Ini peringatan ke-{warnings} dari 3.",
+            parse_mode="Markdown",
+        )
+    return False
 
-    detected_word = contains_badword(user_text, BAD_WORDS)
-    if detected_word:
-        warnings, banned = add_warning(user_id, username, detected_word, user_text)
-        safe_word = escape_markdown(detected_word)
-        if banned:
-            await update.message.reply_text(
-                f"🚫 Kamu telah diblokir karena 3 pelanggaran.\n"
-                f"Kata terakhir yang melanggar: `{safe_word}`",
-                parse_mode="Markdown",
-            )
-        else:
-            await update.message.reply_text(
-                f"⚠️ Pesanmu mengandung kata tidak pantas: `{safe_word}`\n"
-                f"Peringatan ke-{warnings} dari 3.",
-                parse_mode="Markdown",
-            )
-        return
 
-    match = MENFESS_PATTERN.match(user_text)
+async def stage_format(sub: MenfessSubmission) -> bool:
+    match = MENFESS_PATTERN.match(sub.text)
     if not match:
-        await update.message.reply_text(MENFESS_FORMAT_HELP_TEXT, parse_mode="Markdown")
-        return
+        await sub.reply(MENFESS_FORMAT_HELP_TEXT, parse_mode="Markdown")
+        return False
 
     dibalik_masker, target, ungkapan = match.groups()
-    caption = (
+    sub.ungkapan = ungkapan.strip()
+    sub.caption = (
         "📩 *Menfess Baru*\n\n"
         f"Dibalik Masker : {dibalik_masker.strip()}\n"
         f"Target : {target.strip()}\n"
-        f"Ungkapan : {ungkapan.strip()}"
+        f"Ungkapan : {sub.ungkapan}"
     )
+    return True
 
-    if photo:
-        sent = await context.bot.send_photo(
+
+async def stage_not_duplicate(sub: MenfessSubmission) -> bool:
+    if not DUPLICATE_CHECK or sub.user_id in ADMINS:
+        return True
+    fingerprint = DUPLICATES.fingerprint(sub.ungkapan)
+    if fingerprint is None:
+        return True
+    match = DUPLICATES.find(fingerprint)
+    if match is None:
+        # dilepas run_menfess_pipeline; kalau terbit, entry channel menggantikannya
+        sub.duplicate_key = DUPLICATES.reserve(fingerprint)
+        return True
+
+    ch_id, distance = match
+    METRICS.inc("duplicates_rejected_total")
+    logger.info(
+        "Menfess mirip ditolak: user_id=%s mirip channel_message_id=%s beda_bit=%s",
+        sub.user_id,
+        ch_id,
+        distance,
+        extra={"event": "duplicate_hit", "text": sub.ungkapan},
+    )
+    await sub.reply(
+        "🔁 Menfess yang hampir sama sudah dikirim belum lama ini.\n"
+        "Tulis ungkapanmu sendiri ya."
+    )
+    return False
+
+
+async def stage_membership(sub: MenfessSubmission) -> bool:
+    return await check_membership(sub.update, sub.context)
+
+
+async def stage_publish(sub: MenfessSubmission) -> bool:
+    bot = sub.context.bot
+    album_ids = None
+    if len(sub.photos) > 1:
+        media = [
+            InputMediaPhoto(photo, caption=sub.caption, parse_mode="Markdown")
+            if i == 0
+            else InputMediaPhoto(photo)
+            for i, photo in enumerate(sub.photos)
+        ]
+        messages = await OUTBOUND.submit(
+            PRIORITY_CHANNEL,
+            CHANNEL_ID,
+            bot.send_media_group,
             chat_id=CHANNEL_ID,
-            photo=photo,
-            caption=caption,
+            media=media,
+        )
+        sent = messages[0]
+        album_ids = [m.message_id for m in messages]
+    elif sub.photos:
+        sent = await OUTBOUND.submit(
+            PRIORITY_CHANNEL,
+            CHANNEL_ID,
+            bot.send_photo,
+            chat_id=CHANNEL_ID,
+            photo=sub.photos[0],
+            caption=sub.caption,
             parse_mode="Markdown",
         )
     else:
-        sent = await context.bot.send_message(
+        sent = await OUTBOUND.submit(
+            PRIORITY_CHANNEL,
+            CHANNEL_ID,
+            bot.send_message,
             chat_id=CHANNEL_ID,
-            text=caption,
+            text=sub.caption,
             parse_mode="Markdown",
         )
 
-    channel_message_id = sent.message_id
-    register_menfess(channel_message_id, user_id, caption)
-
-    user_last_sent[user_id] = now
-
-    keyboard = build_initial_keyboard(channel_message_id)
-    await update.message.reply_text(MENFESS_SUCCESS_REPLY, reply_markup=keyboard)
+    sub.channel_message_id = sent.message_id
+    register_menfess(sub.channel_message_id, sub.user_id, sub.caption, album_ids)
+    kind = "album" if album_ids else "photo" if sub.photos else "text"
+    METRICS.inc("menfess_posted_total", kind=kind)
+    record_cooldown(sub.user_id)
+
+    keyboard = build_initial_keyboard(sub.channel_message_id)
+    await sub.reply(MENFESS_SUCCESS_REPLY, reply_markup=keyboard)
+    return True
+
+
+# urut dari yang termurah: cek di memori dulu, panggilan jaringan paling akhir,
+# jadi kiriman yang ditolak tidak pernah memakan panggilan API
+MENFESS_PIPELINE = [
+    stage_not_banned,
+    stage_cooldown,
+    stage_has_text,
+    stage_badword,
+    stage_format,
+    stage_not_duplicate,
+    stage_membership,
+    stage_publish,
+]
+
+
+async def run_menfess_pipeline(sub: MenfessSubmission, stages: list | None = None) -> bool:
+    """Jalankan stage berurutan; berhenti di stage pertama yang menolak."""
+    try:
+        for stage in MENFESS_PIPELINE if stages is None else stages:
+            name = stage.__name__
+            start = time.perf_counter()
+            try:
+                passed = await stage(sub)
+            finally:
+                elapsed = time.perf_counter() - start
+                sub.timings[name] = elapsed
+                METRICS.observe("pipeline_stage_seconds", elapsed, stage=name)
+            if not passed:
+                METRICS.inc("pipeline_rejected_total", stage=name)
+                return False
+        return True
+    finally:
+        if sub.duplicate_key is not None:
+            DUPLICATES.remove(sub.duplicate_key)
 
 
+@instrumented
 async def menfess(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    user_id = update.effective_user.id
-    username = update.effective_user.username or "-"
-
     # kalau ini reply ke notif komentar → balasan anonim
     if update.message.reply_to_message:
         parent_id = update.message.reply_to_message.message_id
-        if parent_id in notif_reply_map:
+        if NOTIF_REPLIES.get(update.message.chat_id, parent_id) is not None:
             await handle_reply_to_comment(update, context)
             return
 
-    if is_banned(user_id):
-        await update.message.reply_text(
-            "🚫 Kamu telah diblokir karena berulang kali melanggar aturan."
-        )
-        return
+    await run_menfess_pipeline(MenfessSubmission(update, context, update.message.text))
+
+
+class AlbumBuffer:
+    """Kumpulkan foto satu album (media_group_id sama) lalu proses sekali.
+
+    Telegram mengirim album sebagai beberapa update terpisah tanpa penanda
+    "foto terakhir", jadi album dianggap lengkap setelah `window` detik
+    tanpa foto baru.
+    """
+
+    def __init__(self, window: float):
+        self.window = window
+        self._albums: dict[str, dict] = {}
+
+    def __len__(self) -> int:
+        return len(self._albums)
+
+    def add(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        msg = update.message
+        album = self._albums.get(msg.media_group_id)
+        if album is None:
+            album = {"update": update, "context": context, "caption": None, "photos": []}
+            self._albums[msg.media_group_id] = album
+            album["task"] = asyncio.create_task(self._flush_later(msg.media_group_id))
+
+        album["photos"].append((msg.message_id, msg.photo[-1].file_id))
+        if msg.caption and album["caption"] is None:
+            # caption album hanya ada di salah satu foto
+            album["caption"] = msg.caption
+            album["update"] = update
+        album["last_seen"] = time.monotonic()
+
+    async def _flush_later(self, media_group_id: str):
+        album = self._albums[media_group_id]
+        while True:
+            wait = album["last_seen"] + self.window - time.monotonic()
+            if wait <= 0:
+                break
+            await asyncio.sleep(wait)
+        del self._albums[media_group_id]
+
+        photos = [file_id for _, file_id in sorted(album["photos"])]
+        sub = MenfessSubmission(album["update"], album["context"], album["caption"], photos)
+        # lewat lock user yang sama dengan update biasa: cek cooldown lalu kirim
+        # tidak boleh balapan dengan menfess lain dari user ini
+        processor = album["context"].application.update_processor
+        await processor.run_for(sub.user_id, self._process(media_group_id, sub))
+
+    @staticmethod
+    async def _process(media_group_id: str, sub: MenfessSubmission):
+        try:
+            await run_menfess_pipeline(sub)
+        except Exception:
+            logger.exception("Gagal memproses album media_group_id=%s", media_group_id)
 
-    if not await check_membership(update, context):
-        return
 
-    user_text = update.message.text.strip()
-    now = time.time()
+ALBUMS = AlbumBuffer(ALBUM_WINDOW_SECONDS)
 
-    if user_id not in ADMINS and user_id in user_last_sent:
-        elapsed = now - user_last_sent[user_id]
-        if elapsed < COOLDOWN_SECONDS:
-            remaining = int((COOLDOWN_SECONDS - elapsed) / 60) + 1
-            await update.message.reply_text(
-                "⏳ Kamu hanya bisa kirim 1 menfess setiap 10 menit.\n"
-                f"Tunggu sekitar {remaining} menit lagi ya."
-            )
-            return
 
-    detected_word = contains_badword(user_text, BAD_WORDS)
-    if detected_word:
-        warnings, banned = add_warning(user_id, username, detected_word, user_text)
-        safe_word = escape_markdown(detected_word)
-        if banned:
-            await update.message.reply_text(
-                f"🚫 Kamu telah diblokir karena 3 kali melanggar aturan.\n"
-                f"Kata terakhir yang melanggar: `{safe_word}`",
-                parse_mode="Markdown",
-            )
-        else:
-            await update.message.reply_text(
-                f"⚠️ Pesanmu mengandung kata yang tidak pantas: `{safe_word}`\n"
-                f"Ini peringatan ke-{warnings} dari 3.",
-                parse_mode="Markdown",
-            )
+# 🔹 Handler foto + caption
+@instrumented
+async def menfess_photo(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    if update.message.media_group_id:
+        ALBUMS.add(update, context)
         return
 
-    match = MENFESS_PATTERN.match(user_text)
-    if not match:
-        await update.message.reply_text(MENFESS_FORMAT_HELP_TEXT, parse_mode="Markdown")
-        return
+    photo = update.message.photo[-1].file_id
+    sub = MenfessSubmission(update, context, update.message.caption, photos=[photo])
+    await run_menfess_pipeline(sub)
 
-    dibalik_masker, target, ungkapan = match.groups()
-    text = (
-        "📩 *Menfess Baru*\n\n"
-        f"Dibalik Masker : {dibalik_masker.strip()}\n"
-        f"Target : {target.strip()}\n"
-        f"Ungkapan : {ungkapan.strip()}"
-    )
 
-    sent = await context.bot.send_message(
-        chat_id=CHANNEL_ID, text=text, parse_mode="Markdown"
-    )
+# =========================================================
+# 📋 ADMIN: DAFTAR PELANGGAR, BAN & UNBAN
+# =========================================================
+VIOLATORS_PAGE_SIZE = 10
+VIOLATOR_SORT_LABELS = {
+    "warnings": "⚠️ Peringatan",
+    "recent": "🕒 Terbaru",
+    "banned": "🚫 Banned",
+}
 
-    channel_message_id = sent.message_id
-    register_menfess(channel_message_id, user_id, text)
 
-    user_last_sent[user_id] = now
+def build_violators_page(sort: str, page: int, query: str | None):
+    ids = VIOLATORS.query(sort, query)
+    if not ids:
+        if query:
+            return f"🔍 Tidak ada pelanggar yang cocok dengan \"{query}\".", None
+        return "✅ Belum ada pelanggar terdeteksi.", None
 
-    keyboard = build_initial_keyboard(channel_message_id)
-    await update.message.reply_text(MENFESS_SUCCESS_REPLY, reply_markup=keyboard)
+    pages = (len(ids) + VIOLATORS_PAGE_SIZE - 1) // VIOLATORS_PAGE_SIZE
+    page = max(0, min(page, pages - 1))
+    start = page * VIOLATORS_PAGE_SIZE
 
+    text_list = []
+    for uid in ids[start : start + VIOLATORS_PAGE_SIZE]:
+        info = VIOLATORS.data[uid]
+        username = info.get("username", "-")
+        warnings = info.get("warnings", 0)
+        banned_flag = "🚫" if info.get("banned") else "⚠️"
+        violations = info.get("violations") or []
+        last_word = violations[-1]["word"][:30] if violations else "-"
+        last_time = last_violation_time(info) or "-"
+        text_list.append(
+            f"{banned_flag} {uid} ({username}) — {warnings}x pelanggaran\n"
+            f"Terakhir: {last_word} ({last_time})"
+        )
 
-# 🔹 Handler foto + caption
-async def menfess_photo(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    caption = update.message.caption
+    header = (
+        f"📋 Daftar Pelanggar — {len(ids)} user, hal {page + 1}/{pages}, "
+        f"urut: {VIOLATOR_SORT_LABELS[sort]}"
+    )
+    if query:
+        header += f"\nFilter: {query}"
+    text = header + "\n\n" + "\n\n".join(text_list)
+
+    nav = []
+    if page > 0:
+        nav.append(InlineKeyboardButton("◀️", callback_data=f"vio:{sort}:{page - 1}"))
+    if page < pages - 1:
+        nav.append(InlineKeyboardButton("▶️", callback_data=f"vio:{sort}:{page + 1}"))
+    sorts = [
+        InlineKeyboardButton(
+            f"• {label}" if key == sort else label, callback_data=f"vio:{key}:0"
+        )
+        for key, label in VIOLATOR_SORT_LABELS.items()
+    ]
+    keyboard = [row for row in (nav, sorts) if row]
+    return text, InlineKeyboardMarkup(keyboard)
+
+
+@instrumented
+async def violators(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user_id = update.effective_user.id
-    username = update.effective_user.username or "-"
+    if user_id not in ADMINS:
+        await update.message.reply_text("🚫 Kamu tidak memiliki izin untuk melihat data pelanggar.")
+        return
+
+    # /violators <username|user_id> -> filter; disimpan untuk tombol halaman
+    query = " ".join(context.args).strip() if context.args else None
+    context.user_data["violators_query"] = query
+
+    text, keyboard = build_violators_page("warnings", 0, query)
+    await update.message.reply_text(text, reply_markup=keyboard)
+
 
-    if not await check_membership(update, context):
+@instrumented
+async def violators_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    query = update.callback_query
+    if query.from_user.id not in ADMINS:
+        await query.answer("🚫 Khusus admin.", show_alert=True)
         return
+    await query.answer()
 
-    if not caption:
-        await update.message.reply_text("❌ Kirim foto dengan caption sesuai format menfess.")
+    _, sort, page = query.data.split(":")
+    if sort not in VIOLATOR_SORTS:
         return
+    text, keyboard = build_violators_page(
+        sort, int(page), context.user_data.get("violators_query")
+    )
+    await query.edit_message_text(text, reply_markup=keyboard)
 
-    photo = update.message.photo[-1].file_id
 
-    await process_menfess_text(user_id, username, caption, context, update, photo=photo)
+def parse_user_id_arg(context: ContextTypes.DEFAULT_TYPE):
+    if not context.args or not context.args[0].lstrip("-").isdigit():
+        return None
+    return int(context.args[0])
 
 
-async def violators(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    user_id = update.effective_user.id
-    if user_id not in ADMINS:
-        await update.message.reply_text("🚫 Kamu tidak memiliki izin untuk melihat data pelanggar.")
+@instrumented
+async def ban(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    if update.effective_user.id not in ADMINS:
+        await update.message.reply_text("🚫 Kamu tidak memiliki izin untuk mem-ban user.")
         return
 
-    data = load_violators()
-    if not data:
-        await update.message.reply_text("✅ Belum ada pelanggar terdeteksi.")
+    target_id = parse_user_id_arg(context)
+    if target_id is None:
+        await update.message.reply_text("Gunakan: /ban <user_id>")
         return
 
-    text_list = []
-    for uid, info in data.items():
-        username = info.get("username", "-")
-        warnings = info.get("warnings", 0)
-        banned_flag = "🚫" if info.get("banned") else "⚠️"
-        last_word = info["violations"][-1]["word"] if info["violations"] else "-"
-        text_list.append(
-            f"{banned_flag} `{uid}` ({username}) — {warnings}x pelanggaran\nTerakhir: {last_word}"
-        )
+    VIOLATORS.ban(target_id)
+    await update.message.reply_text(f"🚫 User {target_id} sudah diblokir.")
+
+
+@instrumented
+async def unban(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    if update.effective_user.id not in ADMINS:
+        await update.message.reply_text("🚫 Kamu tidak memiliki izin untuk meng-unban user.")
+        return
+
+    target_id = parse_user_id_arg(context)
+    if target_id is None:
+        await update.message.reply_text("Gunakan: /unban <user_id>")
+        return
 
-    text = "\n\n".join(text_list)
+    if VIOLATORS.unban(target_id) is None:
+        await update.message.reply_text(f"ℹ️ User {target_id} tidak ada di daftar pelanggar.")
+        return
     await update.message.reply_text(
-        f"📋 *Daftar Pelanggar:*\n\n{text}", parse_mode="Markdown"
+        f"✅ User {target_id} sudah di-unban dan peringatannya direset."
     )
 
 
 # =========================================================
 # 🔁 CALLBACK UNTUK TOMBOL INLINE
 # =========================================================
+async def prompt_reply_to_comment(query, comment_id: int):
+    """Tombol "Balas X" di notif gabungan -> minta balasan lewat ForceReply."""
+    notif = query.message
+    # hanya terima ID komentar yang memang ada di tombol notif ini
+    buttons = notif.reply_markup.inline_keyboard if notif.reply_markup else ()
+    label = next(
+        (
+            button.text
+            for row in buttons
+            for button in row
+            if button.callback_data == f"rto:{comment_id}"
+        ),
+        None,
+    )
+    if label is None or NOTIF_REPLIES.get(notif.chat_id, notif.message_id) is None:
+        await notif.reply_text("⚠️ Komentar ini sudah tidak bisa dibalas.")
+        return
+
+    name = label.removeprefix("💬 Balas ")
+    prompt = await notif.reply_text(
+        f"✍️ Tulis balasan anonim untuk {name}:",
+        reply_markup=ForceReply(selective=True, input_field_placeholder=f"Balas {name}"),
+    )
+    NOTIF_REPLIES.put(prompt.chat_id, prompt.message_id, comment_id)
+
+
+@instrumented
 async def menfess_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
     await query.answer()
@@ -720,10 +3410,21 @@ async def menfess_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
         keyboard = build_initial_keyboard(msg_id)
         await query.edit_message_text(MENFESS_SUCCESS_REPLY, reply_markup=keyboard)
 
+    elif data.startswith("rto:"):
+        await prompt_reply_to_comment(query, int(data.split(":")[1]))
+
     elif data.startswith("del_yes:"):
         msg_id = int(data.split(":")[1])
         try:
-            await context.bot.delete_message(chat_id=CHANNEL_ID, message_id=msg_id)
+            for channel_msg_id in MENFESS.message_ids(msg_id):
+                await OUTBOUND.submit(
+                    PRIORITY_CHANNEL,
+                    CHANNEL_ID,
+                    context.bot.delete_message,
+                    chat_id=CHANNEL_ID,
+                    message_id=channel_msg_id,
+                )
+            MENFESS.remove(msg_id)
             await query.edit_message_text("✅ Pesanmu di channel sudah dihapus.")
         except Exception:
             await query.edit_message_text(
@@ -731,17 +3432,175 @@ async def menfess_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
             )
 
 
-def main():
-    if not TOKEN:
-        raise RuntimeError("BOT_TOKEN belum di-set di Token.env")
+# =========================================================
+# 🧹 RETENSI & KOMPAKSI
+# =========================================================
+def run_retention(dry_run: bool = False) -> dict:
+    now = time.time()
+    violations, violation_bytes = VIOLATORS.trim_history(VIOLATION_HISTORY_MAX, dry_run)
+    menfess, menfess_bytes = MENFESS.expire(MENFESS_MAX_AGE_DAYS * 86400, now, dry_run)
+    report = {
+        "dry_run": dry_run,
+        "violations": violations,
+        "violation_bytes": violation_bytes,
+        "menfess": menfess,
+        "menfess_bytes": menfess_bytes,
+    }
+    logger.info("Retensi data: %s", report)
+    return report
+
+
+async def retention_loop():
+    while True:
+        await asyncio.sleep(RETENTION_INTERVAL)
+        try:
+            run_retention()
+        except Exception as e:
+            logger.error("Retensi data gagal: %s", e)
+
+
+@instrumented
+async def retention(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    if update.effective_user.id not in ADMINS:
+        await update.message.reply_text("🚫 Kamu tidak memiliki izin untuk menjalankan retensi.")
+        return
+
+    # default dry-run; "/retention run" untuk benar-benar menghapus
+    dry_run = not (context.args and context.args[0].lower() == "run")
+    report = run_retention(dry_run)
+    title = "🧪 Dry-run retensi" if dry_run else "🧹 Retensi dijalankan"
+    await update.message.reply_text(
+        f"{title}\n\n"
+        f"Riwayat pelanggaran (maks {VIOLATION_HISTORY_MAX}/user): "
+        f"{report['violations']} entri, {report['violation_bytes']} byte\n"
+        f"Menfess > {MENFESS_MAX_AGE_DAYS} hari: "
+        f"{report['menfess']} entri, {report['menfess_bytes']} byte"
+    )
+
 
-    logger.info("Bot menfess berjalan...")
+# =========================================================
+# 📊 STATISTIK ADMIN
+# =========================================================
+METRICS.gauge("notif_reply_map_size", lambda: len(NOTIF_REPLIES))
+METRICS.gauge("cooldown_entries", lambda: len(COOLDOWN))
+METRICS.gauge("menfess_map_size", lambda: len(MENFESS))
+METRICS.gauge("violators_size", lambda: len(VIOLATORS.data))
+METRICS.gauge("membership_cache_size", lambda: len(MEMBERSHIP_CACHE))
+METRICS.gauge("membership_cache_hits", lambda: MEMBERSHIP_CACHE.hits)
+METRICS.gauge("membership_cache_misses", lambda: MEMBERSHIP_CACHE.misses)
+METRICS.gauge("outbound_queue_depth", lambda: len(OUTBOUND._queue))
+METRICS.gauge("album_buffer_size", lambda: len(ALBUMS))
+METRICS.gauge("notif_digest_pending", lambda: len(NOTIF_DIGESTS))
+METRICS.gauge("duplicate_index_size", lambda: len(DUPLICATES))
+
+
+def format_stats() -> str:
+    # salinan di bawah lock: thread store-io / endpoint metrics bisa menambah key
+    with METRICS._lock:
+        counters = sorted(METRICS.counters.items())
+        histograms = sorted(
+            (key, hist.count, hist.quantile(0.5), hist.quantile(0.95), hist.sum)
+            for key, hist in METRICS.histograms.items()
+        )
+        gauges = sorted(METRICS.gauges.items())
+
+    lines = ["📊 Statistik Bot", ""]
+    for name, func in gauges:
+        lines.append(f"{name}: {func()}")
+
+    lines.append("")
+    for (name, labels), value in counters:
+        label = ",".join(f"{k}={v}" for k, v in labels)
+        lines.append(f"{name}{f' [{label}]' if label else ''}: {value:g}")
+
+    lines.append("")
+    lines.append("latency (n / p50 / p95 / rata2 ms):")
+    for (name, labels), count, p50, p95, total in histograms:
+        label = ",".join(str(v) for _, v in labels)
+        lines.append(
+            f"{name}{f' [{label}]' if label else ''}: {count} / "
+            f"{p50 * 1e3:g} / {p95 * 1e3:g} / {total / count * 1e3:.2f}"
+        )
+    # batas 4096 karakter per pesan Telegram
+    return "\n".join(lines)[:4000]
+
+
+@instrumented
+async def reloadwords(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    user_id = update.effective_user.id
+    if user_id not in ADMINS:
+        await update.message.reply_text("🚫 Kamu tidak memiliki izin untuk memuat ulang daftar kata.")
+        return
+
+    try:
+        count, elapsed = await reload_badwords()
+    except Exception as e:
+        logger.error("Gagal reload %s: %s", BADWORDS_FILE, e)
+        await update.message.reply_text(f"⚠️ Gagal memuat ulang {BADWORDS_FILE}: {e}")
+        return
+
+    await update.message.reply_text(
+        f"✅ Daftar kata dimuat ulang: {count} kata ({elapsed * 1e3:.1f} ms)."
+    )
 
-    app = Application.builder().token(TOKEN).build()
+
+@instrumented
+async def stats(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    user_id = update.effective_user.id
+    if user_id not in ADMINS:
+        await update.message.reply_text("🚫 Kamu tidak memiliki izin untuk melihat statistik.")
+        return
+
+    await update.message.reply_text(format_stats())
+
+
+async def on_startup(app: Application):
+    DUPLICATES.rebuild(MENFESS)
+    app.bot_data["badwords_watcher"] = asyncio.create_task(watch_badwords())
+    if WORKER_INDEX in (None, 0):
+        # state bersama: cukup satu worker yang menjalankan retensi
+        app.bot_data["retention_loop"] = asyncio.create_task(retention_loop())
+
+
+async def on_stop(app: Application):
+    # post_stop: bot masih bisa dipakai (HTTPX client ditutup di shutdown)
+    for name in ("badwords_watcher", "retention_loop"):
+        task = app.bot_data.pop(name, None)
+        if task is not None:
+            task.cancel()
+    await NOTIF_DIGESTS.flush_all()
+    await OUTBOUND.stop()
+
+
+async def on_shutdown(app: Application):
+    flush_all_stores()
+    logger.info("Statistik cache keanggotaan: %s", MEMBERSHIP_CACHE.stats())
+    logger.info("Statistik pengiriman keluar: %s", OUTBOUND.stats())
+    logger.info("Log yang dilewati (sampling/rate limit): %s", LOG_SAMPLER.dropped)
+
+
+def build_application() -> Application:
+    builder = (
+        Application.builder()
+        .token(TOKEN)
+        .concurrent_updates(PerUserUpdateProcessor(CONCURRENT_UPDATES))
+        .request(InstrumentedRequest(connection_pool_size=256))
+        .post_init(on_startup)
+        .post_stop(on_stop)
+        .post_shutdown(on_shutdown)
+    )
+    if BOT_API_URL:
+        builder = builder.base_url(f"{BOT_API_URL.rstrip('/')}/bot")
+    app = builder.build()
 
     # PM bot (kirim menfess / reply notif)
     app.add_handler(CommandHandler("start", start))
     app.add_handler(CommandHandler("violators", violators))
+    app.add_handler(CommandHandler("ban", ban))
+    app.add_handler(CommandHandler("unban", unban))
+    app.add_handler(CommandHandler("stats", stats))
+    app.add_handler(CommandHandler("reloadwords", reloadwords))
+    app.add_handler(CommandHandler("retention", retention))
     app.add_handler(
         MessageHandler(filters.ChatType.PRIVATE & filters.PHOTO, menfess_photo)
     )
@@ -751,18 +3610,222 @@ def main():
         )
     )
 
-    # semua pesan teks di grup diskusi
+    # semua pesan teks di grup diskusi + auto-forward foto / album (caption)
     app.add_handler(
         MessageHandler(
-            filters.Chat(GROUP_ID) & filters.TEXT & ~filters.COMMAND,
+            filters.Chat(GROUP_ID)
+            & (
+                (filters.TEXT & ~filters.COMMAND)
+                | (filters.CAPTION & filters.SenderChat(CHANNEL_ID))
+            ),
             handle_group,
         )
     )
 
+    # callback halaman daftar pelanggar (harus sebelum handler callback umum)
+    app.add_handler(CallbackQueryHandler(violators_callback, pattern=r"^vio:"))
+
     # callback tombol inline hapus
     app.add_handler(CallbackQueryHandler(menfess_callback))
 
-    app.run_polling(drop_pending_updates=True)
+    # join/keluar channel -> invalidasi cache keanggotaan
+    app.add_handler(
+        ChatMemberHandler(on_channel_member_update, ChatMemberHandler.CHAT_MEMBER)
+    )
+    return app
+
+
+# =========================================================
+# 🧩 MODE MULTI-WORKER
+# =========================================================
+class UpdateRouter:
+    """Bagikan update ke worker berdasarkan user id (atau chat id).
+
+    Update dari user yang sama selalu ke worker yang sama, jadi urutan per
+    user tetap dijaga `PerUserUpdateProcessor` di worker tersebut. Komentar
+    di thread grup dikirim ke worker milik pengirim menfess-nya, supaya
+    digest notif (`NotifDigest`, di memori per worker) untuk satu penulis
+    dikumpulkan di satu tempat. Pemilik thread dibaca dari menfess map yang
+    diikuti lewat `shared`.
+    """
+
+    def __init__(self, inboxes: list, shared: "SharedState | None" = None):
+        self.inboxes = inboxes
+        self.shared = shared
+
+    def comment_target(self, update: object):
+        """Pengirim menfess untuk komentar di thread grup, atau None."""
+        msg = update.message if isinstance(update, Update) else None
+        if msg is None or msg.chat.id != GROUP_ID or msg.reply_to_message is None:
+            return None
+        if self.shared is not None:
+            self.shared.sync()
+        root = msg.reply_to_message
+        while root.reply_to_message:
+            root = root.reply_to_message
+        return MENFESS.user_for_group_root(root.message_id)
+
+    def worker_for(self, update: object) -> int:
+        key = self.comment_target(update)
+        if key is None:
+            key = PerUserUpdateProcessor.update_key(update)
+        return 0 if key is None else key % len(self.inboxes)
+
+    async def route(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        index = self.worker_for(update)
+        self.inboxes[index].put(update.to_dict())
+        METRICS.inc("routed_updates_total", worker=str(index))
+
+
+def build_router_application(router: UpdateRouter) -> Application:
+    builder = (
+        Application.builder()
+        .token(TOKEN)
+        .request(InstrumentedRequest(connection_pool_size=8))
+    )
+    if BOT_API_URL:
+        builder = builder.base_url(f"{BOT_API_URL.rstrip('/')}/bot")
+    app = builder.build()
+    app.add_handler(TypeHandler(Update, router.route))
+    return app
+
+
+async def run_worker(inbox, done=None):
+    """Proses update dari `inbox` sampai menerima None.
+
+    `done` (opsional, untuk loadtest) menerima ("ready", WORKER_INDEX) setelah
+    start lalu update_id setiap update yang selesai diproses.
+    """
+    app = build_application()
+    loop = asyncio.get_running_loop()
+    pending: set = set()
+
+    async def process(update: Update):
+        try:
+            await app.update_processor.process_update(update, app.process_update(update))
+        finally:
+            if done is not None:
+                done.put(update.update_id)
+
+    async with app:
+        # post_init / post_stop / post_shutdown hanya dipanggil run_polling / run_webhook
+        await on_startup(app)
+        if done is not None:
+            done.put(("ready", WORKER_INDEX))
+        try:
+            while True:
+                data = await loop.run_in_executor(None, inbox.get)
+                if data is None:
+                    break
+                task = asyncio.create_task(process(Update.de_json(data, app.bot)))
+                pending.add(task)
+                task.add_done_callback(pending.discard)
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+        finally:
+            await on_stop(app)
+            await on_shutdown(app)
+
+
+def worker_main(index: int, workers: int, inbox, done=None):
+    """Entry point proses worker (dipanggil lewat multiprocessing)."""
+    global SHARED, WORKER_INDEX, OUTBOUND
+    WORKER_INDEX = index
+    SHARED = SharedState(SHARED_DB_FILE, STORES)
+    SHARED.sync(force=True)
+    # limit Telegram berlaku per bot -> dibagi rata antar worker
+    OUTBOUND = OutboundScheduler(
+        OUTBOUND_GLOBAL_RATE / workers, OUTBOUND_PRIVATE_RATE, OUTBOUND_GROUP_RATE / workers
+    )
+    if METRICS_PORT:
+        start_metrics_server(METRICS_PORT + 1 + index)
+    logger.info("Worker %s/%s siap (event %s)", index, workers, SHARED.last_id)
+    try:
+        asyncio.run(run_worker(inbox, done))
+    finally:
+        SHARED.close()
+
+
+def run_workers(workers: int):
+    """Proses depan: terima update (polling/webhook), bagikan ke N worker."""
+    # tetap terbuka: router mengikuti menfess map untuk membagi komentar grup
+    shared = SharedState(SHARED_DB_FILE, STORES)
+    if shared.seed():
+        logger.info("Database bersama %s diisi dari file JSON", SHARED_DB_FILE)
+    shared.sync(force=True)
+
+    ctx = multiprocessing.get_context("spawn")
+    inboxes = [ctx.Queue() for _ in range(workers)]
+    processes = [
+        ctx.Process(
+            target=worker_main,
+            args=(index, workers, inboxes[index]),
+            name=f"fess-worker-{index}",
+        )
+        for index in range(workers)
+    ]
+    for process in processes:
+        process.start()
+
+    if METRICS_PORT:
+        start_metrics_server(METRICS_PORT)
+    try:
+        run_application(build_router_application(UpdateRouter(inboxes, shared)))
+    finally:
+        for inbox in inboxes:
+            inbox.put(None)
+        for process in processes:
+            process.join(timeout=30)
+        # tulis balik ke file JSON supaya mode satu proses bisa langsung dipakai
+        shared.sync(force=True)
+        for store in STORES:
+            store.export()
+        shared.mark_json_synced()
+        shared.close()
+
+
+def run_application(app: Application):
+    # chat_member tidak dikirim Telegram kecuali diminta eksplisit
+    if BOT_MODE == "webhook":
+        if not WEBHOOK_URL or not WEBHOOK_SECRET:
+            raise RuntimeError(
+                "WEBHOOK_URL dan WEBHOOK_SECRET wajib di-set di Token.env untuk mode webhook"
+            )
+        logger.info(
+            "Bot menfess berjalan (webhook %s:%s/%s)...",
+            WEBHOOK_LISTEN,
+            WEBHOOK_PORT,
+            WEBHOOK_PATH,
+        )
+        app.run_webhook(
+            listen=WEBHOOK_LISTEN,
+            port=WEBHOOK_PORT,
+            url_path=WEBHOOK_PATH,
+            webhook_url=f"{WEBHOOK_URL.rstrip('/')}/{WEBHOOK_PATH}",
+            secret_token=WEBHOOK_SECRET,
+            drop_pending_updates=DROP_PENDING_UPDATES,
+            allowed_updates=Update.ALL_TYPES,
+        )
+    else:
+        logger.info("Bot menfess berjalan (polling)...")
+        app.run_polling(
+            drop_pending_updates=DROP_PENDING_UPDATES,
+            allowed_updates=Update.ALL_TYPES,
+        )
+
+
+def main():
+    if not TOKEN:
+        raise RuntimeError("BOT_TOKEN belum di-set di Token.env")
+
+    if WORKERS > 1:
+        run_workers(WORKERS)
+        return
+
+    app = build_application()
+    if METRICS_PORT:
+        start_metrics_server(METRICS_PORT)
+    run_application(app)
 
 
 if __name__ == "__main__":
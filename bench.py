@@ -0,0 +1,195 @@
+"""Micro-benchmark filter kata kotor.
+
+Jalankan: python bench.py
+Membandingkan `contains_badword` versi lama (regex per kata per pesan) dengan
+`BadwordMatcher` pada 200, 2k dan 20k kata, serta `super_clean_text` lama
+(37 pass replace) dengan `TextNormalizer`. `fuzzy` mengukur
+`FuzzyBadwordMatcher` (typo + obfuscation) pada 10k kata terhadap budget
+per pesan, dibanding Levenshtein naif ke semua kata.
+"""
+import os
+import random
+import re
+import string
+import sys
+import time
+import unicodedata
+
+os.environ.setdefault("CHANNEL_ID", "-1000000000001")
+os.environ.setdefault("GROUP_ID", "-1000000000002")
+os.environ.setdefault("CHANNEL_USERNAME", "@bench")
+
+import Fess  # noqa: E402
+
+SIZES = (200, 2_000, 20_000)
+MESSAGES = 50
+
+
+def legacy_contains_badword(message: str, badwords: list):
+    cleaned = Fess.super_clean_text(message)
+    for word in badwords:
+        word_cleaned = Fess.super_clean_text(word)
+        if re.search(rf"\b{re.escape(word_cleaned)}\b", cleaned):
+            return word
+    return None
+
+
+def legacy_super_clean_text(text: str) -> str:
+    text = unicodedata.normalize("NFKD", text)
+    text = text.lower()
+    for key, val in dict(Fess.LEET_REPLACEMENTS).items():
+        text = text.replace(key, val)
+    return re.sub(r"[^a-z0-9\s]", "", text)
+
+
+def random_word(rng: random.Random) -> str:
+    return "".join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(3, 9)))
+
+
+def build_wordlist(rng: random.Random, size: int) -> list:
+    words = list(Fess.BAD_WORDS)
+    while len(words) < size:
+        words.append(random_word(rng))
+    return words[:size]
+
+
+def build_messages(rng: random.Random, words: list) -> list:
+    messages = []
+    for i in range(MESSAGES):
+        body = [random_word(rng) for _ in range(rng.randint(10, 60))]
+        if i % 10 == 0:
+            body.insert(rng.randrange(len(body)), rng.choice(words))
+        messages.append(
+            "Dibalik Masker : aku\nTarget : kamu\nUngkapan : " + " ".join(body)
+        )
+    return messages
+
+
+def timeit(func, messages: list) -> tuple[float, list]:
+    start = time.perf_counter()
+    results = [func(msg) for msg in messages]
+    return (time.perf_counter() - start) / len(messages), results
+
+
+def bench_badwords():
+    rng = random.Random(42)
+    print(f"{'kata':>8} {'lama (ms/pesan)':>16} {'matcher (ms/pesan)':>19} {'build (ms)':>11}")
+    for size in SIZES:
+        words = build_wordlist(rng, size)
+        messages = build_messages(rng, words)
+
+        start = time.perf_counter()
+        matcher = Fess.BadwordMatcher(words)
+        build = time.perf_counter() - start
+
+        legacy, expected = timeit(lambda m: legacy_contains_badword(m, words), messages)
+        fast, got = timeit(matcher.find, messages)
+        assert got == expected, "hasil matcher berbeda dengan versi lama"
+        print(f"{size:>8} {legacy * 1e3:>16.3f} {fast * 1e3:>19.4f} {build * 1e3:>11.1f}")
+
+
+def bench_normalizer():
+    rng = random.Random(7)
+    words = build_wordlist(rng, 2_000)
+    messages = build_messages(rng, words) * 20
+    uncached = Fess.TextNormalizer(Fess.LEET_REPLACEMENTS, cache_size=0)
+    cases = (
+        ("pesan", messages),
+        ("kata", words * 5),
+    )
+    print(f"{'input':>8} {'lama (us)':>10} {'translate (us)':>15} {'+lru (us)':>10}")
+    for label, texts in cases:
+        legacy, expected = timeit(legacy_super_clean_text, texts)
+        fast, got = timeit(uncached, texts)
+        cached, got_cached = timeit(Fess.TEXT_NORMALIZER, texts)
+        assert got == expected == got_cached, "hasil normalizer berbeda"
+        print(f"{label:>8} {legacy * 1e6:>10.2f} {fast * 1e6:>15.2f} {cached * 1e6:>10.2f}")
+
+
+def levenshtein(a: str, b: str) -> int:
+    prev = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        row = [i]
+        for j, cb in enumerate(b, 1):
+            row.append(min(row[j - 1] + 1, prev[j] + 1, prev[j - 1] + (ca != cb)))
+        prev = row
+    return prev[-1]
+
+
+def naive_fuzzy(message: str, words: list, max_distance: int):
+    tokens = Fess.super_clean_text(message).split()
+    for word in words:
+        if any(levenshtein(token, word) <= max_distance for token in tokens):
+            return word
+    return None
+
+
+def obfuscate(rng: random.Random, word: str) -> str:
+    kind = rng.randrange(3)
+    if kind == 0:  # huruf diulang
+        i = rng.randrange(len(word))
+        return word[:i] + word[i] * rng.randint(2, 5) + word[i:]
+    if kind == 1:  # huruf dipisah spasi
+        return " ".join(word)
+    i = rng.randrange(len(word))  # typo satu huruf
+    return word[:i] + rng.choice(string.ascii_lowercase.replace(word[i], "")) + word[i + 1 :]
+
+
+def bench_fuzzy(size: int = 10_000):
+    rng = random.Random(21)
+    words = build_wordlist(rng, size)
+    long_words = [w for w in words if len(w) >= Fess.BADWORD_FUZZY_MIN_LEN]
+    messages = build_messages(rng, words) * 4
+    hidden = []
+    for i, msg in enumerate(messages):
+        if i % 2 == 0:
+            word = rng.choice(long_words)
+            hidden.append(word)
+            messages[i] = f"{msg} {obfuscate(rng, word)}"
+        else:
+            hidden.append(None)
+
+    budget = Fess.BADWORD_FUZZY_BUDGET_MS / 1000
+    print(
+        f"{size} kata, {len(messages)} pesan, budget {Fess.BADWORD_FUZZY_BUDGET_MS} ms/pesan"
+    )
+    print(f"{'jarak':>6} {'build (ms)':>11} {'avg (ms)':>9} {'p99 (ms)':>9} {'max (ms)':>9} {'deteksi':>8}")
+    for max_distance in (0, 1, 2):
+        start = time.perf_counter()
+        matcher = Fess.FuzzyBadwordMatcher(
+            words, max_distance=max_distance, budget=budget, cache_size=0
+        )
+        build = time.perf_counter() - start
+
+        latencies = []
+        found = 0
+        for msg, word in zip(messages, hidden):
+            start = time.perf_counter()
+            result = matcher.find(msg)
+            latencies.append(time.perf_counter() - start)
+            found += word is not None and result is not None
+        latencies.sort()
+        p99 = latencies[int(0.99 * (len(latencies) - 1))]
+        print(
+            f"{max_distance:>6} {build * 1e3:>11.1f} {sum(latencies) / len(latencies) * 1e3:>9.3f} "
+            f"{p99 * 1e3:>9.3f} {latencies[-1] * 1e3:>9.3f} "
+            f"{found:>4}/{sum(w is not None for w in hidden)}"
+        )
+
+    sample = messages[:4]
+    naive, _ = timeit(lambda m: naive_fuzzy(m, words, 1), sample)
+    print(f"naif (Levenshtein ke semua kata, jarak 1): {naive * 1e3:.1f} ms/pesan")
+
+
+BENCHES = {
+    "badwords": bench_badwords,
+    "normalizer": bench_normalizer,
+    "fuzzy": bench_fuzzy,
+}
+
+
+if __name__ == "__main__":
+    names = sys.argv[1:] or list(BENCHES)
+    for name in names:
+        print(f"== {name}")
+        BENCHES[name]()
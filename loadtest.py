@@ -0,0 +1,537 @@
+"""Load test end-to-end handler bot terhadap stub Bot API lokal.
+
+Handler asli (`menfess`, `menfess_photo`, `handle_group`, `menfess_callback`)
+dijalankan lewat `Application` buatan `Fess.build_application()`, tapi semua
+panggilan Bot API diarahkan ke server HTTP palsu di localhost. Trafik DM,
+foto, komentar grup dan callback dibangkitkan dengan laju tetap, lalu
+throughput dan latency p50/p95/p99 per jenis update disimpan sebagai JSON.
+
+Contoh:
+    python loadtest.py --duration 20 --dm-rate 20 --group-rate 100 \\
+        --callback-rate 10 --menfess 50000 --violators 5000 --out hasil.json
+
+Skala mode multi-worker (throughput jenuh untuk tiap jumlah worker):
+    python loadtest.py --workers 1,2,4 --updates 20000 --out skala.json
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import multiprocessing
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+TOKEN = "123456:LOADTEST"
+CHANNEL_ID = -1001000000001
+GROUP_ID = -1001000000002
+BOT_USER = {"id": 123456, "is_bot": True, "first_name": "Masker", "username": "masker_bot"}
+
+
+# =========================================================
+# 🧪 STUB BOT API
+# =========================================================
+class StubBotAPI(BaseHTTPRequestHandler):
+    """Menjawab /bot<token>/<method> dengan objek palsu yang valid untuk PTB."""
+
+    message_ids = itertools.count(1_000_000)
+    latency = 0.0
+    calls: dict = {}
+    lock = threading.Lock()
+
+    def log_message(self, *args):
+        pass
+
+    def _params(self) -> dict:
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length) if length else b""
+        ctype = self.headers.get("Content-Type", "")
+        if ctype.startswith("application/json"):
+            return json.loads(body or b"{}")
+        if ctype.startswith("application/x-www-form-urlencoded"):
+            params = {}
+            for key, values in parse_qs(body.decode()).items():
+                try:
+                    params[key] = json.loads(values[0])
+                except json.JSONDecodeError:
+                    params[key] = values[0]
+            return params
+        return {}
+
+    def _message(self, params: dict) -> dict:
+        chat_id = params.get("chat_id", 0)
+        chat_id = chat_id if isinstance(chat_id, int) else CHANNEL_ID
+        return {
+            "message_id": next(self.message_ids),
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private" if chat_id > 0 else "supergroup"},
+            "from": BOT_USER,
+            "text": params.get("text") or params.get("caption") or "",
+        }
+
+    def do_POST(self):
+        method = self.path.rsplit("/", 1)[-1]
+        params = self._params()
+        with self.lock:
+            self.calls[method] = self.calls.get(method, 0) + 1
+        if self.latency:
+            time.sleep(self.latency)
+
+        if method == "getMe":
+            result = BOT_USER
+        elif method == "getChatMember":
+            result = {
+                "status": "member",
+                "user": {"id": params.get("user_id", 1), "is_bot": False, "first_name": "u"},
+            }
+        elif method in ("sendMessage", "sendPhoto", "editMessageText"):
+            result = self._message(params)
+        elif method == "sendMediaGroup":
+            result = [self._message(params)]
+        else:
+            result = True
+
+        payload = json.dumps({"ok": True, "result": result}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+
+def start_stub_server(latency: float) -> ThreadingHTTPServer:
+    StubBotAPI.latency = latency
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubBotAPI)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+# =========================================================
+# 🗃️ DATA AWAL & UPDATE SINTETIS
+# =========================================================
+def prepare_workdir(args) -> str:
+    """Direktori kerja sementara berisi badwords + store dengan ukuran tertentu."""
+    workdir = tempfile.mkdtemp(prefix="fess-loadtest-")
+    shutil.copy(os.path.join(HERE, "badwords.txt"), workdir)
+
+    menfess = {}
+    for i in range(args.menfess):
+        text = f"📩 *Menfess Baru*\n\nDibalik Masker : a{i}\nTarget : b{i}\nUngkapan : isi {i}"
+        menfess[str(i + 1)] = {
+            "user_id": 10_000 + i % args.users,
+            "text": text,
+            "group_message_id": 500_000 + i,
+        }
+    with open(os.path.join(workdir, "menfess_map.json"), "w", encoding="utf-8") as f:
+        json.dump(menfess, f, ensure_ascii=False)
+
+    violators = {
+        str(900_000 + i): {
+            "username": f"v{i}",
+            "warnings": 1 + i % 3,
+            "banned": i % 3 == 2,
+            "violations": [{"word": "anjing", "message": "anjing", "timestamp": "2024-01-01 00:00:00"}],
+        }
+        for i in range(args.violators)
+    }
+    with open(os.path.join(workdir, "violators.json"), "w", encoding="utf-8") as f:
+        json.dump(violators, f, ensure_ascii=False)
+    return workdir
+
+
+class TrafficGenerator:
+    def __init__(self, args):
+        self.args = args
+        self.rng = random.Random(args.seed)
+        self.update_ids = itertools.count(1)
+        self.message_ids = itertools.count(1)
+        self.users = itertools.count(10_000_000)
+
+    def _user(self, user_id: int) -> dict:
+        return {"id": user_id, "is_bot": False, "first_name": f"u{user_id}", "username": f"u{user_id}"}
+
+    def _private_message(self, user_id: int, **fields) -> dict:
+        return {
+            "message_id": next(self.message_ids),
+            "date": int(time.time()),
+            "chat": {"id": user_id, "type": "private"},
+            "from": self._user(user_id),
+            **fields,
+        }
+
+    def _menfess_text(self) -> str:
+        words = " ".join(f"kata{self.rng.randint(0, 9999)}" for _ in range(self.rng.randint(5, 40)))
+        if self.rng.random() < self.args.badword_ratio:
+            words += " anjing"
+        return f"Dibalik Masker : aku\nTarget : kamu\nUngkapan : {words}"
+
+    def dm(self) -> dict:
+        # user baru tiap kali supaya cooldown tidak menolak semuanya
+        user_id = next(self.users)
+        return {
+            "update_id": next(self.update_ids),
+            "message": self._private_message(user_id, text=self._menfess_text()),
+        }
+
+    def photo(self) -> dict:
+        user_id = next(self.users)
+        photo = [{"file_id": f"photo{user_id}", "file_unique_id": f"u{user_id}", "width": 90, "height": 90}]
+        return {
+            "update_id": next(self.update_ids),
+            "message": self._private_message(user_id, photo=photo, caption=self._menfess_text()),
+        }
+
+    def group(self) -> dict:
+        root_id = 500_000 + self.rng.randrange(max(1, self.args.menfess))
+        user_id = self.rng.randint(20_000_000, 20_100_000)
+        chat = {"id": GROUP_ID, "type": "supergroup", "title": "diskusi"}
+        root = {"message_id": root_id, "date": int(time.time()), "chat": chat, "text": "root"}
+        return {
+            "update_id": next(self.update_ids),
+            "message": {
+                "message_id": next(self.message_ids),
+                "date": int(time.time()),
+                "chat": chat,
+                "from": self._user(user_id),
+                "text": "komentar",
+                "reply_to_message": root,
+            },
+        }
+
+    def callback(self) -> dict:
+        user_id = self.rng.randint(10_000, 10_000 + self.args.users)
+        ch_id = self.rng.randrange(1, max(2, self.args.menfess))
+        return {
+            "update_id": next(self.update_ids),
+            "callback_query": {
+                "id": str(next(self.update_ids)),
+                "from": self._user(user_id),
+                "chat_instance": "ci",
+                "data": self.rng.choice([f"del:{ch_id}", f"del_back:{ch_id}"]),
+                "message": self._private_message(user_id, text="ok"),
+            },
+        }
+
+
+# =========================================================
+# 📈 RUNNER
+# =========================================================
+def percentile(sorted_values: list, pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    idx = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[idx]
+
+
+def summarize(latencies: list, duration: float) -> dict:
+    values = sorted(latencies)
+    return {
+        "count": len(values),
+        "throughput_per_s": round(len(values) / duration, 2) if duration else 0.0,
+        "p50_ms": round(percentile(values, 50) * 1e3, 3),
+        "p95_ms": round(percentile(values, 95) * 1e3, 3),
+        "p99_ms": round(percentile(values, 99) * 1e3, 3),
+        "max_ms": round((values[-1] if values else 0.0) * 1e3, 3),
+    }
+
+
+def wrap_handlers(app, handler_latency: dict):
+    """Bungkus callback tiap handler untuk mencatat latency handler saja."""
+    for handlers in app.handlers.values():
+        for handler in handlers:
+            callback = handler.callback
+            name = callback.__name__
+
+            async def timed(update, context, _callback=callback, _name=name):
+                start = time.perf_counter()
+                try:
+                    return await _callback(update, context)
+                finally:
+                    handler_latency.setdefault(_name, []).append(time.perf_counter() - start)
+
+            handler.callback = timed
+
+
+async def run_load(args, Fess) -> dict:
+    from telegram import Update
+
+    app = Fess.build_application()
+    if not args.real_limits:
+        Fess.OUTBOUND = Fess.OutboundScheduler(1e9, 1e9, 1e9)
+
+    handler_latency: dict = {}
+    wrap_handlers(app, handler_latency)
+    await app.initialize()
+
+    generator = TrafficGenerator(args)
+    streams = [
+        ("dm", args.dm_rate, generator.dm),
+        ("photo", args.photo_rate, generator.photo),
+        ("group", args.group_rate, generator.group),
+        ("callback", args.callback_rate, generator.callback),
+    ]
+    e2e_latency: dict = {name: [] for name, rate, _ in streams if rate > 0}
+    errors = {"count": 0}
+    pending: set = set()
+
+    async def dispatch(kind: str, data: dict):
+        update = Update.de_json(data, app.bot)
+        start = time.perf_counter()
+        try:
+            await app.update_processor.process_update(update, app.process_update(update))
+        except Exception:
+            errors["count"] += 1
+        e2e_latency[kind].append(time.perf_counter() - start)
+
+    async def producer(kind: str, rate: float, make):
+        interval = 1.0 / rate
+        next_at = time.perf_counter()
+        end = next_at + args.duration
+        while next_at < end:
+            task = asyncio.create_task(dispatch(kind, make()))
+            pending.add(task)
+            task.add_done_callback(pending.discard)
+            next_at += interval
+            await asyncio.sleep(max(0.0, next_at - time.perf_counter()))
+
+    started = time.perf_counter()
+    await asyncio.gather(*(producer(k, r, m) for k, r, m in streams if r > 0))
+    if pending:
+        await asyncio.gather(*pending)
+    # notif komentar ditahan NOTIF_DIGEST_SECONDS; post_stop tidak jalan di sini
+    await Fess.NOTIF_DIGESTS.flush_all()
+    elapsed = time.perf_counter() - started
+
+    await Fess.OUTBOUND.stop()
+    await app.shutdown()
+    Fess.flush_all_stores()
+
+    return {
+        "elapsed_s": round(elapsed, 3),
+        "errors": errors["count"],
+        "updates": {k: summarize(v, elapsed) for k, v in e2e_latency.items()},
+        "handlers": {k: summarize(v, elapsed) for k, v in handler_latency.items()},
+        "shed": {
+            kind: Fess.METRICS.counter_value("updates_shed_total", kind=kind)
+            for kind in Fess.ADMISSION_CLASSES.values()
+        },
+        "bot_api_calls": dict(StubBotAPI.calls),
+    }
+
+
+# =========================================================
+# 🧩 SKALA MULTI-WORKER
+# =========================================================
+def route_key(data: dict) -> int:
+    """Kunci shard seperti `Fess.UpdateRouter`: user pengirim, kalau tidak ada chat.
+
+    Komentar grup di sini tetap per pengirim; router asli mengirimnya ke
+    worker penulis menfess, yang butuh menfess map.
+    """
+    body = data.get("message") or data.get("callback_query") or {}
+    if body.get("from"):
+        return body["from"]["id"]
+    return body.get("chat", {}).get("id", 0)
+
+
+def _bench_seed():
+    import Fess
+
+    Fess.SharedState(Fess.SHARED_DB_FILE, Fess.STORES).seed()
+
+
+def _bench_worker(index: int, workers: int, inbox, done, real_limits: bool, api_latency: float):
+    # stub Bot API per worker (thread di proses ini) supaya stub tidak jadi leher botol
+    StubBotAPI.message_ids = itertools.count(1_000_000 + index * 100_000_000)
+    server = start_stub_server(api_latency)
+    os.environ["BOT_API_URL"] = f"http://127.0.0.1:{server.server_address[1]}"
+    import Fess
+
+    if not real_limits:
+        Fess.OUTBOUND_GLOBAL_RATE = Fess.OUTBOUND_PRIVATE_RATE = Fess.OUTBOUND_GROUP_RATE = 1e9
+    Fess.worker_main(index, workers, inbox, done)
+
+
+def run_workers_load(args, workers: int) -> dict:
+    """Kirim `--updates` update sekaligus ke N worker, ukur waktu sampai habis."""
+    workdir = prepare_workdir(args)
+    os.chdir(workdir)
+    ctx = multiprocessing.get_context("spawn")
+    seeder = ctx.Process(target=_bench_seed)
+    seeder.start()
+    seeder.join()
+
+    inboxes = [ctx.Queue() for _ in range(workers)]
+    done = ctx.Queue()
+    processes = [
+        ctx.Process(
+            target=_bench_worker,
+            args=(i, workers, inboxes[i], done, args.real_limits, args.api_latency),
+        )
+        for i in range(workers)
+    ]
+    for process in processes:
+        process.start()
+    for _ in range(workers):
+        done.get(timeout=120)  # ("ready", index)
+
+    generator = TrafficGenerator(args)
+    streams = [
+        (args.dm_rate, generator.dm),
+        (args.photo_rate, generator.photo),
+        (args.group_rate, generator.group),
+        (args.callback_rate, generator.callback),
+    ]
+    makers = [make for rate, make in streams if rate > 0]
+    weights = [rate for rate, make in streams if rate > 0]
+    updates = [generator.rng.choices(makers, weights)[0]() for _ in range(args.updates)]
+    per_worker = [0] * workers
+
+    started = time.perf_counter()
+    for data in updates:
+        index = route_key(data) % workers
+        per_worker[index] += 1
+        inboxes[index].put(data)
+    for _ in updates:
+        done.get(timeout=300)
+    elapsed = time.perf_counter() - started
+
+    for inbox in inboxes:
+        inbox.put(None)
+    for process in processes:
+        process.join(timeout=60)
+    os.chdir(HERE)
+    shutil.rmtree(workdir, ignore_errors=True)
+
+    return {
+        "workers": workers,
+        "updates": len(updates),
+        "per_worker": per_worker,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_per_s": round(len(updates) / elapsed, 2),
+    }
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=HERE, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--duration", type=float, default=10.0, help="detik trafik")
+    parser.add_argument("--dm-rate", type=float, default=10.0, help="menfess teks per detik")
+    parser.add_argument("--photo-rate", type=float, default=2.0, help="menfess foto per detik")
+    parser.add_argument("--group-rate", type=float, default=50.0, help="komentar grup per detik")
+    parser.add_argument("--callback-rate", type=float, default=5.0, help="callback per detik")
+    parser.add_argument("--menfess", type=int, default=10_000, help="ukuran awal menfess map")
+    parser.add_argument("--violators", type=int, default=1_000, help="ukuran awal violators")
+    parser.add_argument("--users", type=int, default=5_000, help="jumlah penulis menfess awal")
+    parser.add_argument("--badword-ratio", type=float, default=0.05)
+    parser.add_argument("--api-latency", type=float, default=0.0, help="jeda stub per panggilan (detik)")
+    parser.add_argument("--concurrency", type=int, default=16, help="CONCURRENT_UPDATES")
+    parser.add_argument("--real-limits", action="store_true", help="pakai rate limit Telegram asli")
+    parser.add_argument(
+        "--workers",
+        type=lambda value: [int(n) for n in value.split(",")],
+        help="mode skala: daftar jumlah worker, mis. 1,2,4",
+    )
+    parser.add_argument("--updates", type=int, default=10_000, help="update per run mode skala")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--out", default="loadtest_result.json")
+    return parser.parse_args(argv)
+
+
+def main_workers(args, out_path: str):
+    os.environ.update(
+        {
+            "BOT_TOKEN": TOKEN,
+            "CHANNEL_ID": str(CHANNEL_ID),
+            "GROUP_ID": str(GROUP_ID),
+            "CHANNEL_USERNAME": "@loadtest",
+            "CONCURRENT_UPDATES": str(args.concurrency),
+        }
+    )
+    sys.path.insert(0, HERE)
+    runs = [run_workers_load(args, workers) for workers in args.workers]
+    report = {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "config": vars(args),
+        "cpu_count": os.cpu_count(),
+        "scaling": runs,
+    }
+    with open(out_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+
+    base = runs[0]["throughput_per_s"]
+    for run in runs:
+        print(
+            f"{run['workers']:>3} worker: {run['throughput_per_s']:>9}/s  "
+            f"x{run['throughput_per_s'] / base:.2f}  per worker={run['per_worker']}"
+        )
+    print(f"hasil disimpan di {out_path}")
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    out_path = os.path.abspath(args.out)
+    if args.workers:
+        main_workers(args, out_path)
+        return
+
+    server = start_stub_server(args.api_latency)
+    workdir = prepare_workdir(args)
+
+    os.environ.update(
+        {
+            "BOT_TOKEN": TOKEN,
+            "CHANNEL_ID": str(CHANNEL_ID),
+            "GROUP_ID": str(GROUP_ID),
+            "CHANNEL_USERNAME": "@loadtest",
+            "BOT_API_URL": f"http://127.0.0.1:{server.server_address[1]}",
+            "CONCURRENT_UPDATES": str(args.concurrency),
+        }
+    )
+    os.chdir(workdir)
+    sys.path.insert(0, HERE)
+    import Fess
+
+    try:
+        results = asyncio.run(run_load(args, Fess))
+    finally:
+        server.shutdown()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "config": vars(args),
+        **results,
+    }
+    with open(out_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+
+    for kind, summary in report["updates"].items():
+        print(
+            f"{kind:>9}: {summary['count']:>6} update  {summary['throughput_per_s']:>8}/s  "
+            f"p50={summary['p50_ms']}ms p95={summary['p95_ms']}ms p99={summary['p99_ms']}ms"
+        )
+    print(f"hasil disimpan di {out_path}")
+
+
+if __name__ == "__main__":
+    main()
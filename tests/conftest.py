@@ -0,0 +1,59 @@
+"""Fess.py memuat file data dari direktori kerja saat di-import, jadi test
+dijalankan di direktori sementara dengan env minimal sebelum import."""
+import os
+import shutil
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+os.environ.setdefault("CHANNEL_ID", "-1000000000001")
+os.environ.setdefault("GROUP_ID", "-1000000000002")
+os.environ.setdefault("CHANNEL_USERNAME", "@fesstest")
+os.environ.setdefault("BOT_TOKEN", "123456:TEST")
+
+WORKDIR = tempfile.mkdtemp(prefix="fess-test-")
+shutil.copy(os.path.join(ROOT, "badwords.txt"), WORKDIR)
+os.chdir(WORKDIR)
+sys.path.insert(0, ROOT)
+
+
+import contextlib  # noqa: E402
+
+import pytest  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def stub_api():
+    """Stub Bot API dari loadtest.py; mengembalikan base URL untuk BOT_API_URL."""
+    import loadtest
+
+    server = loadtest.start_stub_server(0.0)
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+
+
+@contextlib.asynccontextmanager
+async def running_app(api_url: str):
+    """`Fess.build_application()` terhadap stub, tanpa batas kirim keluar."""
+    import Fess
+
+    outbound = Fess.OUTBOUND
+    Fess.BOT_API_URL = api_url
+    Fess.OUTBOUND = Fess.OutboundScheduler(1e9, 1e9, 1e9)
+    app = Fess.build_application()
+    await app.initialize()
+    try:
+        yield app
+    finally:
+        await Fess.OUTBOUND.stop()
+        await app.shutdown()
+        Fess.OUTBOUND = outbound
+
+
+async def dispatch(app, data: dict):
+    """Jalankan satu update lewat update processor, seperti Application asli."""
+    from telegram import Update
+
+    update = Update.de_json(data, app.bot)
+    await app.update_processor.process_update(update, app.process_update(update))
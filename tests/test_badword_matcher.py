@@ -0,0 +1,28 @@
+"""`FuzzyBadwordMatcher`: typo dicocokkan ke bentuk bersih kata di daftar."""
+import Fess
+
+
+def test_typo_of_leet_spelled_entry():
+    matcher = Fess.FuzzyBadwordMatcher(["k0nt0l", "puk1m4k"], max_distance=1)
+    assert matcher.find("dasar pukimek") == "puk1m4k"
+    assert matcher.find("k o n t o o l l") == "k0nt0l"
+    assert matcher.find("kontel banget") == "k0nt0l"
+    assert matcher.find("kantor pusat") is None
+
+
+def test_collapse_and_join_false_positives_can_be_exempted():
+    words = ["cok", "coli", "buta", "homo"]
+    messages = ["aku suka cook", "coolii", "buttaa", "homoo", "c o o k"]
+    matcher = Fess.FuzzyBadwordMatcher(words)
+    assert [matcher.find(m) for m in messages] == ["cok", "coli", "buta", "homo", "cok"]
+
+    safe = Fess.FuzzyBadwordMatcher(words, safe_words={"cook", "coolii", "buttaa", "homoo"})
+    assert [safe.find(m) for m in messages] == [None] * len(messages)
+    # kata kotornya sendiri (persis atau diulang) tetap kena
+    assert safe.find("dasar cok") == "cok"
+    assert safe.find("cokkk") == "cok"
+
+
+def test_fuzzy_matching_is_opt_in():
+    assert not Fess.BADWORD_FUZZY
+    assert type(Fess.make_badword_matcher(["cok"])) is Fess.BadwordMatcher
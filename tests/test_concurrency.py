@@ -0,0 +1,251 @@
+"""Update paralel (`CONCURRENT_UPDATES`) tidak boleh merusak cooldown dan
+hitungan peringatan: update dari user yang sama diproses berurutan."""
+import asyncio
+import itertools
+import random
+import time
+
+from conftest import dispatch, running_app
+
+import Fess
+
+IDS = itertools.count(1)
+
+
+def private_text(user_id: int, text: str) -> dict:
+    return {
+        "update_id": next(IDS),
+        "message": {
+            "message_id": next(IDS),
+            "date": int(time.time()),
+            "chat": {"id": user_id, "type": "private"},
+            "from": {"id": user_id, "is_bot": False, "first_name": f"u{user_id}"},
+            "text": text,
+        },
+    }
+
+
+def menfess_text(rng: random.Random, badword: bool = False) -> str:
+    words = " ".join(f"kata{rng.randint(0, 10**9)}" for _ in range(12))
+    if badword:
+        words += " anjing"
+    return f"Dibalik Masker : aku\nTarget : kamu\nUngkapan : {words}"
+
+
+def registered(user_id: int) -> int:
+    return sum(1 for info in Fess.MENFESS.data.values() if info["user_id"] == user_id)
+
+
+def warnings(user_id: int) -> int:
+    return (Fess.VIOLATORS.data.get(str(user_id)) or {}).get("warnings", 0)
+
+
+def test_interleaved_updates_keep_exact_counts(stub_api):
+    rng = random.Random(11)
+    senders = [70_001, 70_002, 70_003]  # 6 menfess valid masing-masing
+    offenders = [70_101, 70_102]  # 5 pesan kata kotor masing-masing
+    updates = [private_text(uid, menfess_text(rng)) for uid in senders for _ in range(6)]
+    updates += [private_text(uid, menfess_text(rng, True)) for uid in offenders for _ in range(5)]
+    rng.shuffle(updates)
+
+    async def main():
+        async with running_app(stub_api) as app:
+            assert app.update_processor.max_concurrent_updates > 1
+            await asyncio.gather(*(dispatch(app, data) for data in updates))
+
+    shed_before = sum(
+        Fess.METRICS.counter_value("updates_shed_total", kind=k)
+        for k in Fess.ADMISSION_CLASSES.values()
+    )
+    asyncio.run(main())
+
+    # cooldown: hanya COOLDOWN_BURST menfess per user yang lolos
+    for uid in senders:
+        assert registered(uid) == Fess.COOLDOWN_BURST
+        assert Fess.COOLDOWN.retry_after(uid) > 0
+    # peringatan berhenti tepat di 3 (ban); pesan berikutnya ditolak karena banned
+    for uid in offenders:
+        assert registered(uid) == 0
+        assert warnings(uid) == 3
+        assert Fess.is_banned(uid)
+        assert len(Fess.VIOLATORS.data[str(uid)]["violations"]) == 3
+    assert shed_before == sum(
+        Fess.METRICS.counter_value("updates_shed_total", kind=k)
+        for k in Fess.ADMISSION_CLASSES.values()
+    )
+
+
+def group_comment(user_id: int) -> dict:
+    data = private_text(user_id, "komentar")
+    data["message"]["chat"] = {"id": Fess.GROUP_ID, "type": "supergroup"}
+    return data
+
+
+def test_flooding_commenter_is_shed_while_waiting_for_lock():
+    from telegram import Update
+
+    slots, queue_max, flood = 2, 5, 20
+    processor = Fess.PerUserUpdateProcessor(slots, queue_max=queue_max)
+    gate = asyncio.Event()
+    ran = []
+
+    async def work(tag):
+        ran.append(tag)
+        await gate.wait()
+
+    def shed(kind: str) -> float:
+        return Fess.METRICS.counter_value("updates_shed_total", kind=kind)
+
+    async def main():
+        group_before, dm_before = shed("group"), shed("dm")
+        comments = [Update.de_json(group_comment(80_001), None) for _ in range(flood)]
+        tasks = [
+            asyncio.create_task(processor.process_update(update, work(f"g{i}")))
+            for i, update in enumerate(comments)
+        ]
+        for _ in range(50):
+            await asyncio.sleep(0)
+        # 1 jalan (pegang lock user), queue_max menunggu lock, sisanya dibuang
+        assert ran == ["g0"]
+        assert len(processor._pending) == queue_max
+        assert processor._pending_count == {
+            Fess.ADMIT_URGENT: 0, Fess.ADMIT_DM: 0, Fess.ADMIT_GROUP: queue_max
+        }
+        assert shed("group") - group_before == flood - 1 - queue_max
+
+        # DM dari user lain mengusir komentar terbaru yang masih menunggu lock
+        dm = Update.de_json(private_text(80_002, "halo"), None)
+        tasks.append(asyncio.create_task(processor.process_update(dm, work("dm"))))
+        for _ in range(10):
+            await asyncio.sleep(0)
+        assert shed("group") - group_before == flood - queue_max
+        assert ran == ["g0", "dm"]
+
+        gate.set()
+        await asyncio.gather(*tasks)
+        assert ran == ["g0", "dm", "g1", "g2", "g3", "g4"]
+        assert shed("dm") == dm_before
+        assert not processor._pending and not processor._waiting
+        assert processor._active == 0 and not processor._locks
+
+    asyncio.run(main())
+
+
+def callback_query(user_id: int) -> dict:
+    return {
+        "update_id": next(IDS),
+        "callback_query": {
+            "id": str(next(IDS)),
+            "from": {"id": user_id, "is_bot": False, "first_name": f"u{user_id}"},
+            "chat_instance": "ci",
+            "data": "x",
+        },
+    }
+
+
+def test_callback_jumps_queue_of_distinct_commenters():
+    from telegram import Update
+
+    slots, queue_max, commenters = 2, 5, 30
+    processor = Fess.PerUserUpdateProcessor(slots, queue_max=queue_max)
+    gate = asyncio.Event()
+    ran = []
+
+    async def work(tag):
+        ran.append(tag)
+        await gate.wait()
+
+    def shed(kind: str) -> float:
+        return Fess.METRICS.counter_value("updates_shed_total", kind=kind)
+
+    async def main():
+        group_before, urgent_before = shed("group"), shed("urgent")
+        tasks = [
+            asyncio.create_task(
+                processor.process_update(
+                    Update.de_json(group_comment(81_000 + i), None), work(f"g{i}")
+                )
+            )
+            for i in range(commenters)
+        ]
+        for _ in range(50):
+            await asyncio.sleep(0)
+        # `slots` jalan, `queue_max` menunggu slot, sisanya langsung dibuang
+        assert ran == ["g0", "g1"]
+        assert shed("group") - group_before == commenters - slots - queue_max
+
+        callback = Update.de_json(callback_query(81_999), None)
+        tasks.append(asyncio.create_task(processor.process_update(callback, work("cb"))))
+        for _ in range(10):
+            await asyncio.sleep(0)
+        assert shed("group") - group_before == commenters - slots - queue_max + 1
+
+        gate.set()
+        await asyncio.gather(*tasks)
+        # callback mendapat slot pertama yang kosong, sebelum komentar yang antri
+        assert ran[2] == "cb"
+        assert ran == ["g0", "g1", "cb", "g2", "g3", "g4", "g5"]
+        assert shed("urgent") == urgent_before
+        assert not any(processor._pending_count.values())
+
+    asyncio.run(main())
+
+
+def album_photo(user_id: int, group: str, index: int, caption: str | None) -> dict:
+    data = private_text(user_id, "")
+    message = data["message"]
+    del message["text"]
+    message["media_group_id"] = group
+    message["photo"] = [
+        {"file_id": f"{group}-{index}", "file_unique_id": f"{group}-{index}", "width": 90, "height": 90}
+    ]
+    if caption:
+        message["caption"] = caption
+    return data
+
+
+def test_album_flush_respects_per_user_cooldown(stub_api, monkeypatch):
+    rng = random.Random(19)
+    monkeypatch.setattr(Fess.ALBUMS, "window", 0.05)
+    two_albums, album_and_text = 70_201, 70_202
+    updates = [
+        album_photo(two_albums, f"a{n}", i, menfess_text(rng) if i == 0 else None)
+        for n in range(2)
+        for i in range(2)
+    ]
+    updates += [
+        album_photo(album_and_text, "b0", i, menfess_text(rng) if i == 0 else None)
+        for i in range(2)
+    ]
+    updates.append(private_text(album_and_text, menfess_text(rng)))
+
+    async def main():
+        async with running_app(stub_api) as app:
+            await asyncio.gather(*(dispatch(app, data) for data in updates))
+            # album baru diproses setelah jendela album lewat
+            flushes = [album["task"] for album in Fess.ALBUMS._albums.values()]
+            assert len(flushes) == 3
+            await asyncio.gather(*flushes)
+
+    asyncio.run(main())
+
+    for uid in (two_albums, album_and_text):
+        assert registered(uid) == Fess.COOLDOWN_BURST
+        assert Fess.COOLDOWN.retry_after(uid) > 0
+
+
+def test_concurrent_duplicates_from_different_accounts(stub_api):
+    text = menfess_text(random.Random(22))
+    accounts = [70_301 + i for i in range(5)]
+    rejected_before = Fess.METRICS.counter_value("duplicates_rejected_total")
+
+    async def main():
+        async with running_app(stub_api) as app:
+            await asyncio.gather(*(dispatch(app, private_text(uid, text)) for uid in accounts))
+
+    asyncio.run(main())
+
+    assert sum(registered(uid) for uid in accounts) == 1
+    assert Fess.METRICS.counter_value("duplicates_rejected_total") - rejected_before == 4
+    # pesanan fingerprint dilepas; yang tersisa hanya entry channel
+    assert not [key for key in Fess.DUPLICATES._entries if key.startswith("pending-")]
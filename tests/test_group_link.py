@@ -0,0 +1,80 @@
+"""Auto-forward menfess foto / album (caption, bukan text) tetap ter-link ke
+thread grup, jadi komentar di thread sampai ke pengirimnya."""
+import asyncio
+import time
+
+from conftest import dispatch, running_app
+
+import Fess
+
+CHANNEL = {"id": Fess.CHANNEL_ID, "type": "channel", "title": "fess"}
+
+
+def auto_forward(group_message_id: int, channel_message_id: int, **fields) -> dict:
+    return {
+        "update_id": group_message_id,
+        "message": {
+            "message_id": group_message_id,
+            "date": int(time.time()),
+            "chat": {"id": Fess.GROUP_ID, "type": "supergroup"},
+            "from": {"id": 777000, "is_bot": False, "first_name": "Telegram"},
+            "sender_chat": CHANNEL,
+            "is_automatic_forward": True,
+            "forward_from_chat": CHANNEL,
+            "forward_from_message_id": channel_message_id,
+            "forward_date": int(time.time()),
+            **fields,
+        },
+    }
+
+
+def test_captioned_auto_forwards_are_linked(stub_api):
+    photo = [{"file_id": "f", "file_unique_id": "f", "width": 90, "height": 90}]
+    caption = "📩 Menfess Baru\n\nDibalik Masker : a\nTarget : b\nUngkapan : c"
+    Fess.register_menfess(91_001, 71_001, caption)
+    Fess.register_menfess(91_010, 71_002, caption, [91_010, 91_011])
+    updates = [
+        auto_forward(92_001, 91_001, photo=photo, caption=caption),
+        auto_forward(92_010, 91_010, photo=photo, caption=caption, media_group_id="m1"),
+        auto_forward(92_011, 91_011, photo=photo, media_group_id="m1"),
+    ]
+
+    async def main():
+        async with running_app(stub_api) as app:
+            for data in updates:
+                await dispatch(app, data)
+
+    asyncio.run(main())
+
+    assert Fess.MENFESS.user_for_group_root(92_001) == 71_001
+    assert Fess.MENFESS.user_for_group_root(92_010) == 71_002
+    assert Fess.MENFESS.user_for_group_root(92_011) is None
+
+
+def test_router_sends_comments_to_the_menfess_authors_worker():
+    from telegram import Update
+
+    class Inbox(list):
+        put = list.append
+
+    author, commenters = 71_101, [71_200 + i for i in range(6)]
+    Fess.register_menfess(91_101, author, "📩 Menfess Baru\n\nUngkapan : router")
+    Fess.MENFESS.link_by_channel_id(92_101, 91_101)
+    router = Fess.UpdateRouter([Inbox() for _ in range(4)])
+
+    def comment(user_id: int, reply_to: dict | None) -> Update:
+        message = {
+            "message_id": user_id,
+            "date": int(time.time()),
+            "chat": {"id": Fess.GROUP_ID, "type": "supergroup"},
+            "from": {"id": user_id, "is_bot": False, "first_name": "k"},
+            "text": "komentar",
+        }
+        if reply_to is not None:
+            message["reply_to_message"] = reply_to
+        return Update.de_json({"update_id": user_id, "message": message}, None)
+
+    root = auto_forward(92_101, 91_101, text="x")["message"]
+    assert {router.worker_for(comment(uid, root)) for uid in commenters} == {author % 4}
+    # bukan komentar thread menfess: tetap per pengirim
+    assert router.worker_for(comment(71_201, None)) == 71_201 % 4
@@ -0,0 +1,61 @@
+"""`TextNormalizer` harus sama persis dengan `super_clean_text` versi lama."""
+import random
+import re
+import sys
+import unicodedata
+
+import Fess
+
+SEED = 20240101
+CASES = 20_000
+
+
+def legacy_super_clean_text(text: str) -> str:
+    # implementasi lama: NFKD -> lower -> replace per karakter -> regex
+    text = unicodedata.normalize("NFKD", text)
+    text = text.lower()
+    for key, val in dict(Fess.LEET_REPLACEMENTS).items():
+        text = text.replace(key, val)
+    return re.sub(r"[^a-z0-9\s]", "", text)
+
+
+def random_char(rng: random.Random) -> str:
+    kind = rng.randrange(4)
+    if kind == 0:  # ASCII (fast path translate)
+        return chr(rng.randrange(128))
+    if kind == 1:  # leetspeak + huruf small caps
+        return rng.choice(list(Fess.LEET_REPLACEMENTS))
+    if kind == 2:  # huruf beraksen, fullwidth, spasi unicode, ligatur (NFKD)
+        return rng.choice("éÀçñüÖ ＡＢｃ１２ﬁﬀ  　İẞΩµ²½")
+    while True:  # code point acak di seluruh rentang unicode
+        code = rng.randrange(sys.maxunicode + 1)
+        if not 0xD800 <= code <= 0xDFFF:
+            return chr(code)
+
+
+def random_text(rng: random.Random) -> str:
+    return "".join(random_char(rng) for _ in range(rng.randint(0, 40)))
+
+
+def test_matches_legacy_on_random_code_points():
+    rng = random.Random(SEED)
+    normalizer = Fess.TextNormalizer(Fess.LEET_REPLACEMENTS, cache_size=0)
+    for _ in range(CASES):
+        text = random_text(rng)
+        assert normalizer(text) == legacy_super_clean_text(text), repr(text)
+
+
+def test_every_code_point_alone():
+    normalizer = Fess.TextNormalizer(Fess.LEET_REPLACEMENTS, cache_size=0)
+    for code in range(sys.maxunicode + 1):
+        if 0xD800 <= code <= 0xDFFF:
+            continue
+        char = chr(code)
+        assert normalizer(char) == legacy_super_clean_text(char), hex(code)
+
+
+def test_cached_and_long_inputs_match():
+    rng = random.Random(SEED + 1)
+    texts = [random_text(rng) * rng.randint(1, 5) for _ in range(500)]
+    for text in texts + texts:  # putaran kedua lewat cache LRU
+        assert Fess.TEXT_NORMALIZER(text) == legacy_super_clean_text(text)
@@ -0,0 +1,126 @@
+"""Log bersama multi-worker: INSERT di thread I/O, event sendiri tidak
+diterapkan dua kali, dan snapshot tidak menghapus event yang masih antri."""
+import asyncio
+import json
+import threading
+
+import pytest
+
+import Fess
+
+
+class CounterStore:
+    name = "counter"
+
+    def __init__(self, path: str = "counter.json"):
+        self.path = path
+        self.total = 0
+
+    def files(self) -> list:
+        return [self.path]
+
+    def export(self):
+        with open(self.path, "w", encoding="utf-8") as f:
+            f.write(self.dump())
+
+    def apply(self, event: dict):
+        self.total += event["n"]
+
+    def dump(self) -> str:
+        return json.dumps({"total": self.total})
+
+    def restore(self, payload: str):
+        self.total = json.loads(payload)["total"]
+
+
+def worker(path: str) -> tuple[Fess.SharedState, CounterStore]:
+    store = CounterStore()
+    state = Fess.SharedState(path, [store])
+    state.sync(force=True)
+    return state, store
+
+
+async def drain():
+    # compact() dijadwalkan ke loop lalu menulis lagi di thread I/O
+    for _ in range(2):
+        await asyncio.get_running_loop().run_in_executor(Fess.STORE_IO_EXECUTOR, lambda: None)
+        await asyncio.sleep(0)
+
+
+def test_workers_converge_across_compaction(tmp_path, monkeypatch):
+    monkeypatch.setattr(Fess, "SHARED_COMPACT_EVERY", 4)
+    path = str(tmp_path / "state.db")
+    (a, store_a), (b, store_b) = worker(path), worker(path)
+
+    async def main():
+        for n in range(1, 4):
+            a.append(store_a, {"n": n})
+            b.append(store_b, {"n": 10 * n})
+        assert (store_a.total, store_b.total) == (6, 60)  # langsung, tanpa menunggu tulis
+        await drain()
+
+    asyncio.run(main())
+    assert a.conn.execute("SELECT MAX(upto) FROM snapshots").fetchone()[0] >= 4
+    a.sync()
+    b.sync()
+    assert store_a.total == store_b.total == 66
+    assert a.sync(force=True) == 0  # event sendiri tidak diterapkan lagi
+
+    c, store_c = worker(path)
+    assert store_c.total == 66
+
+    # b tertinggal kompaksi sementara INSERT miliknya masih antri
+    gate = threading.Event()
+
+    async def lagging():
+        a.append(store_a, {"n": 1000})
+        await drain()
+        a.sync()
+        Fess.STORE_IO_EXECUTOR.submit(gate.wait)
+        b.append(store_b, {"n": 100})
+        assert store_b.total == 166
+        a._write_compaction(a.last_id, a._last_seq, a._dump_stores())
+        b.sync(force=True)
+        assert store_b.total == 1166  # snapshot + event sendiri yang belum tercakup
+        gate.set()
+        await drain()
+
+    asyncio.run(lagging())
+    for state in (a, b, c):
+        state.sync(force=True)
+    assert store_a.total == store_b.total == store_c.total == 1166
+    for state in (a, b, c):
+        state.close()
+
+
+def test_seed_follows_json_changed_after_export(tmp_path):
+    path = str(tmp_path / "state.db")
+    front = CounterStore(str(tmp_path / "counter.json"))
+    front.total = 5
+    front.export()
+    assert Fess.SharedState(path, [front]).seed()
+    assert not Fess.SharedState(path, [front]).seed()
+
+    # run multi-worker lalu export bersih
+    a, store_a = worker(path)
+    a.append(store_a, {"n": 2})
+    store_a.path = front.path
+    store_a.export()
+    a.mark_json_synced()
+    assert not Fess.SharedState(path, [front]).seed()
+
+    # mode satu proses mengubah file JSON -> database diisi ulang dari JSON
+    front.total = 40
+    front.export()
+    assert Fess.SharedState(path, [front]).seed()
+    assert worker(path)[1].total == 40
+
+    # database dan JSON sama-sama berubah sejak export -> tolak start
+    b, store_b = worker(path)
+    b.append(store_b, {"n": 1})
+    front.total = 41
+    front.export()
+    with pytest.raises(RuntimeError):
+        Fess.SharedState(path, [front]).seed()
+    for state in (a, b):
+        state.close()
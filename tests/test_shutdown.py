@@ -0,0 +1,31 @@
+"""Notif komentar yang masih ditahan digest terkirim saat bot berhenti, dengan
+urutan hook yang sama seperti `run_polling` / `run_webhook`."""
+import asyncio
+
+import Fess
+
+
+def test_pending_digest_is_sent_on_stop(stub_api, monkeypatch):
+    monkeypatch.setattr(Fess, "BOT_API_URL", stub_api)
+    monkeypatch.setattr(Fess, "OUTBOUND", Fess.OutboundScheduler(1e9, 1e9, 1e9))
+
+    def notifications(result: str) -> float:
+        return Fess.METRICS.counter_value("notifications_total", result=result)
+
+    sent, failed = notifications("sent"), notifications("failed")
+
+    async def main():
+        app = Fess.build_application()
+        await app.initialize()
+        await app.start()
+        Fess.NOTIF_DIGESTS.add(app.bot, 72_001, 72_002, "komentator", 93_001)
+        # urutan Application.run_*: stop -> post_stop -> shutdown -> post_shutdown
+        await app.stop()
+        await app.post_stop(app)
+        await app.shutdown()
+        await app.post_shutdown(app)
+
+    asyncio.run(main())
+
+    assert notifications("sent") - sent == 1
+    assert notifications("failed") == failed
@@ -0,0 +1,149 @@
+"""Mode webhook end-to-end: `python Fess.py` dengan BOT_MODE=webhook di
+subprocess, Bot API diarahkan ke stub `loadtest.StubBotAPI`, lalu update
+sintetis di-POST ke endpoint webhook."""
+import json
+import os
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+
+import pytest
+
+from conftest import ROOT
+
+import loadtest
+
+SECRET = "rahasia-test"
+PATH = "telegram-test"
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_until(predicate, timeout: float = 20.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.05)
+    return False
+
+
+def port_open(port: int) -> bool:
+    with socket.socket() as sock:
+        return sock.connect_ex(("127.0.0.1", port)) == 0
+
+
+@pytest.fixture(scope="module")
+def webhook_bot():
+    loadtest.StubBotAPI.calls = {}
+    stub = loadtest.start_stub_server(0.0)
+    port = free_port()
+    workdir = tempfile.mkdtemp(prefix="fess-webhook-")
+    shutil.copy(os.path.join(ROOT, "badwords.txt"), workdir)
+    env = dict(
+        os.environ,
+        BOT_TOKEN=loadtest.TOKEN,
+        CHANNEL_ID=str(loadtest.CHANNEL_ID),
+        GROUP_ID=str(loadtest.GROUP_ID),
+        CHANNEL_USERNAME="@webhooktest",
+        BOT_API_URL=f"http://127.0.0.1:{stub.server_address[1]}",
+        BOT_MODE="webhook",
+        WEBHOOK_URL="https://contoh.invalid",
+        WEBHOOK_PATH=PATH,
+        WEBHOOK_LISTEN="127.0.0.1",
+        WEBHOOK_PORT=str(port),
+        WEBHOOK_SECRET=SECRET,
+        WORKERS="1",
+    )
+    proc = subprocess.Popen(
+        [sys.executable, os.path.join(ROOT, "Fess.py")],
+        cwd=workdir,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+    )
+    try:
+        if not wait_until(lambda: port_open(port) or proc.poll() is not None):
+            pytest.fail("server webhook tidak jalan")
+        if proc.poll() is not None:
+            pytest.fail(proc.stderr.read().decode(errors="replace"))
+        yield port
+    finally:
+        proc.send_signal(signal.SIGINT)
+        try:
+            proc.wait(timeout=15)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+        stub.shutdown()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def post_update(port: int, update: dict, secret: str | None = SECRET) -> int:
+    headers = {"Content-Type": "application/json"}
+    if secret is not None:
+        headers["X-Telegram-Bot-Api-Secret-Token"] = secret
+    request = urllib.request.Request(
+        f"http://127.0.0.1:{port}/{PATH}",
+        data=json.dumps(update).encode(),
+        headers=headers,
+        method="POST",
+    )
+    try:
+        with urllib.request.urlopen(request, timeout=10) as response:
+            return response.status
+    except urllib.error.HTTPError as e:
+        return e.code
+
+
+def private_update(update_id: int, text: str) -> dict:
+    user = {"id": 4242, "is_bot": False, "first_name": "Uji", "username": "uji"}
+    message = {
+        "message_id": update_id,
+        "date": int(time.time()),
+        "chat": {"id": 4242, "type": "private"},
+        "from": user,
+        "text": text,
+    }
+    if text.startswith("/"):
+        message["entities"] = [{"type": "bot_command", "offset": 0, "length": len(text)}]
+    return {"update_id": update_id, "message": message}
+
+
+def sent_messages() -> int:
+    return loadtest.StubBotAPI.calls.get("sendMessage", 0)
+
+
+def test_webhook_registered_with_secret(webhook_bot):
+    assert loadtest.StubBotAPI.calls.get("setWebhook", 0) == 1
+
+
+def test_update_runs_handler(webhook_bot):
+    before = sent_messages()
+    assert post_update(webhook_bot, private_update(1, "/start")) == 200
+    assert wait_until(lambda: sent_messages() == before + 1)
+
+
+def test_menfess_via_webhook(webhook_bot):
+    before = sent_messages()
+    text = "Dibalik Masker : aku\nTarget : kamu\nUngkapan : salam dari webhook"
+    assert post_update(webhook_bot, private_update(2, text)) == 200
+    # posting ke channel + balasan sukses ke pengirim
+    assert wait_until(lambda: sent_messages() == before + 2)
+
+
+@pytest.mark.parametrize("secret", [None, "salah"])
+def test_wrong_secret_rejected(webhook_bot, secret):
+    before = sent_messages()
+    assert post_update(webhook_bot, private_update(3, "/start"), secret=secret) == 403
+    time.sleep(0.5)
+    assert sent_messages() == before